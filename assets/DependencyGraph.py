@@ -21,119 +21,16 @@ from __future__ import annotations
 import argparse
 import json
 import re
+import sys
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List
 
 import networkx as nx
 from networkx.algorithms.community import greedy_modularity_communities
 
-
-# ===========================================================
-# LaTeX comment handling
-# ===========================================================
-
-def strip_comments_preserve_escaped_percent(text: str) -> str:
-    """Remove LaTeX comments (%) but preserve escaped \\%."""
-    out_lines: List[str] = []
-    for line in text.splitlines():
-        buf: List[str] = []
-        i = 0
-        while i < len(line):
-            ch = line[i]
-            if ch == '%':
-                if i > 0 and line[i - 1] == '\\':
-                    buf.append('%')
-                    i += 1
-                else:
-                    break
-            else:
-                buf.append(ch)
-                i += 1
-        out_lines.append(''.join(buf))
-    return '\n'.join(out_lines)
-
-
-# ===========================================================
-# Balanced-brace parsing utilities
-# ===========================================================
-
-def find_balanced_block(
-    s: str,
-    start_idx: int,
-    open_char: str = "{",
-    close_char: str = "}"
-) -> Tuple[str, int]:
-    """Return (block_without_outer_braces, index_after_block). Assumes s[start_idx] == open_char."""
-    if start_idx >= len(s) or s[start_idx] != open_char:
-        raise ValueError(f"Expected '{open_char}' at position {start_idx}")
-
-    depth = 0
-    i = start_idx
-    while i < len(s):
-        c = s[i]
-        if c == open_char:
-            depth += 1
-        elif c == close_char:
-            depth -= 1
-            if depth == 0:
-                return s[start_idx + 1:i], i + 1
-        i += 1
-
-    raise ValueError("Unbalanced braces.")
-
-
-def iter_glossary_entries(tex: str) -> List[Tuple[str, str]]:
-    """Return list of (key, body) for \\newglossaryentry{key}{ body } with balanced 'body'."""
-    pattern = re.compile(r"\\newglossaryentry\{")
-    pos = 0
-    out: List[Tuple[str, str]] = []
-
-    while True:
-        m = pattern.search(tex, pos)
-        if not m:
-            break
-
-        try:
-            key, after_key = find_balanced_block(tex, m.end() - 1)
-        except ValueError:
-            pos = m.end()
-            continue
-
-        j = after_key
-        while j < len(tex) and tex[j].isspace():
-            j += 1
-
-        if j >= len(tex) or tex[j] != "{":
-            pos = j
-            continue
-
-        try:
-            body, after_body = find_balanced_block(tex, j)
-        except ValueError:
-            pos = j + 1
-            continue
-
-        out.append((key.strip(), body))
-        pos = after_body
-
-    return out
-
-
-def get_field_value_kvblock(kv_block: str, field: str) -> str | None:
-    """Extract field={...} from a key=value block, allowing nested braces."""
-    m = re.search(rf"{re.escape(field)}\s*=", kv_block)
-    if not m:
-        return None
-    i = m.end()
-    while i < len(kv_block) and kv_block[i].isspace():
-        i += 1
-    if i >= len(kv_block) or kv_block[i] != "{":
-        return None
-    try:
-        val, _ = find_balanced_block(kv_block, i)
-    except ValueError:
-        return None
-    return val
+# the shared \newglossaryentry parser (glossary_store.py) sits at the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import glossary_store  # noqa: E402
 
 
 # ===========================================================
@@ -167,16 +64,6 @@ def collect_adictml_tex_files(project_root: Path, recursive: bool = False) -> Li
     return [p.resolve() for p in candidates if p.exists() and p.is_file()]
 
 
-def load_combined_tex(paths: List[Path]) -> str:
-    """Concatenate multiple .tex files into one string (with file boundary markers)."""
-    chunks: List[str] = []
-    for p in paths:
-        chunks.append(f"% --- BEGIN FILE: {p.as_posix()} ---\n")
-        chunks.append(p.read_text(encoding="utf-8", errors="replace"))
-        chunks.append(f"\n% --- END FILE: {p.as_posix()} ---\n")
-    return "\n".join(chunks)
-
-
 # ===========================================================
 # Graph building
 # ===========================================================
@@ -586,22 +473,19 @@ def main() -> None:
     if not sources:
         raise SystemExit(f"No ADictML_*.tex files found under: {PROJECT_ROOT}")
 
-    combined_tex = strip_comments_preserve_escaped_percent(load_combined_tex(sources))
-    entries = iter_glossary_entries(combined_tex)
+    store = glossary_store.load(PROJECT_ROOT, files=sources)
 
     glossary: Dict[str, str] = {}
     names: Dict[str, str] = {}
     explicit_refs: Dict[str, List[str]] = {}
 
-    for key, body in entries:
-        body_nocom = strip_comments_preserve_escaped_percent(body)
-        body_nocom = re.sub(r"\s+", " ", body_nocom).strip()
-
-        desc_raw = get_field_value_kvblock(body_nocom, "description")
-        if not desc_raw:
+    for e in store:
+        key = e.key
+        desc_raw = re.sub(r"\s+", " ", e.field("description", ""))
+        if not desc_raw.strip():
             continue
 
-        name_raw = get_field_value_kvblock(body_nocom, "name") or key
+        name_raw = re.sub(r"\s+", " ", e.field("name", "")) or key
         refs = extract_gls_refs(desc_raw)
 
         if (key in glossary) and (not args.last_wins):
@@ -7,11 +7,16 @@ Spyder-friendly (no CLI args).
 """
 
 import re
+import sys
 from pathlib import Path
 from collections import Counter
 from datetime import datetime
 import xml.etree.ElementTree as ET
 
+# the shared \newglossaryentry parser (glossary_store.py) sits at the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import glossary_store  # noqa: E402
+
 # ---------------- Configuration ----------------
 
 MAIN_TEX_NAME = "ADictML_Main.tex"
@@ -28,8 +33,6 @@ FEED_STATS_PREFIX = "Current coverage:"
 # -----------------------------------------------
 
 INPUT_RE = re.compile(r'\\input\{([^}]+)\}')
-NEW_ENTRY_RE = re.compile(r'\\newglossaryentry\s*\{[^}]+\}\s*\{', re.MULTILINE)
-TYPE_RE = re.compile(r'type\s*=\s*([a-zA-Z]+)')
 
 # Parse \printglossary[ ... ] blocks
 PRINTGLOSSARY_RE = re.compile(r'\\printglossary\s*\[(.*?)\]', re.DOTALL)
@@ -43,23 +46,6 @@ def read_text(path: Path) -> str:
 def write_text(path: Path, content: str) -> None:
     path.write_text(content, encoding="utf-8", newline="\n")
 
-def find_matching_brace(text: str, start: int) -> int:
-    depth = 0
-    for i in range(start, len(text)):
-        if text[i] == "{":
-            depth += 1
-        elif text[i] == "}":
-            depth -= 1
-            if depth == 0:
-                return i
-    raise ValueError("Unmatched brace in file")
-
-def extract_glossary_entries(text: str):
-    for m in NEW_ENTRY_RE.finditer(text):
-        brace_start = m.end() - 1
-        brace_end = find_matching_brace(text, brace_start)
-        yield text[brace_start + 1 : brace_end]
-
 def collect_tex_files(main_file: Path):
     seen = set()
     stack = [main_file]
@@ -254,18 +240,9 @@ def main():
 
     tex_files = collect_tex_files(main_tex)
 
-    counts = Counter()
-    total = 0
-
-    for tex in tex_files:
-        text = read_text(tex)
-        for entry_body in extract_glossary_entries(text):
-            total += 1
-            m = TYPE_RE.search(entry_body)
-            if m:
-                counts[m.group(1)] += 1
-            else:
-                counts[DEFAULT_TYPE] += 1
+    store = glossary_store.load(repo_root, files=sorted(tex_files))
+    counts = Counter(e.field("type", "").strip() or DEFAULT_TYPE for e in store)
+    total = len(store)
 
     print("\nGlossary entry counts by type")
     print("--------------------------------")
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Run the generation steps of updateit.sh, skipping the ones that are up to date.
+
+Each step names the files it reads (glob patterns, relative to the repo root,
+its own script included) and the files it writes. Its fingerprint is a SHA-256
+over the command line and the path and content of every input; a step runs
+only when that fingerprint differs from the one recorded after its last
+successful run, or when one of its outputs is missing. Content hashes are
+remembered with each file's mtime and size, so an unchanged file is not read
+again. Steps are independent and run in parallel; each one's output is printed
+in one piece when it finishes, followed by its wall time.
+
+The record lives in .dictml_cache/pipeline.json (ignored by git); delete it,
+or pass --force, to rerun everything.
+
+Run (from anywhere)
+-------------------
+python assets/pipeline.py                 # all stale steps
+python assets/pipeline.py graph           # only the named steps
+python assets/pipeline.py --dry-run       # say what would run
+python assets/pipeline.py --force         # run every step regardless
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+SCRIPT_DIR = Path(__file__).resolve().parent          # .../assets
+PROJECT_ROOT = SCRIPT_DIR.parent                      # .../ (repo root)
+STAMP_FILE = PROJECT_ROOT / ".dictml_cache" / "pipeline.json"
+STAMP_VERSION = 1
+
+
+class Step(NamedTuple):
+    name: str
+    argv: Tuple[str, ...]        # run from the repo root; "python" is this interpreter
+    inputs: Tuple[str, ...]      # glob patterns, relative to the repo root
+    outputs: Tuple[str, ...]     # paths, relative to the repo root
+
+
+STEPS: Tuple[Step, ...] = (
+    Step("graph",
+         ("python", "assets/DependencyGraph.py"),
+         inputs=("ADictML_*.tex", "assets/DependencyGraph.py", "glossary_store.py"),
+         outputs=("assets/glossary_network.html", "assets/glossary_network.json")),
+    Step("counts",
+         ("python", "assets/countterms.py"),
+         inputs=("*.tex", "assets/countterms.py", "glossary_store.py"),
+         # it also rewrites README.md, whose case differs between checkouts
+         outputs=("feed.xml",)),
+)
+
+
+# ----------------------------- fingerprints -----------------------------
+class Hasher:
+    """SHA-256 of files, reusing the previous run's digest when a file's
+    mtime and size are unchanged."""
+
+    def __init__(self, known: Dict[str, list]):
+        self.known = known                    # rel path -> [mtime_ns, size, hex]
+        self.seen: Dict[str, list] = {}
+
+    def digest(self, rel: str) -> str:
+        hit = self.seen.get(rel)
+        if hit is not None:
+            return hit[2]
+        st = (PROJECT_ROOT / rel).stat()
+        old = self.known.get(rel)
+        if old and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+            hexd = old[2]
+        else:
+            h = hashlib.sha256()
+            with open(PROJECT_ROOT / rel, "rb") as fh:
+                for chunk in iter(lambda: fh.read(1 << 20), b""):
+                    h.update(chunk)
+            hexd = h.hexdigest()
+        self.seen[rel] = [st.st_mtime_ns, st.st_size, hexd]
+        return hexd
+
+
+def expand_inputs(step: Step) -> List[str]:
+    files = set()
+    for pat in step.inputs:
+        for p in PROJECT_ROOT.glob(pat):
+            if p.is_file():
+                files.add(p.relative_to(PROJECT_ROOT).as_posix())
+    return sorted(files)
+
+
+def fingerprint(step: Step, hasher: Hasher) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([STAMP_VERSION, list(step.argv)]).encode())
+    for rel in expand_inputs(step):
+        h.update(b"\0" + rel.encode() + b"\0" + hasher.digest(rel).encode())
+    return h.hexdigest()
+
+
+# ----------------------------- stamp file -----------------------------
+def load_stamps() -> dict:
+    try:
+        data = json.loads(STAMP_FILE.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {"steps": {}, "files": {}}
+    if not isinstance(data, dict) or data.get("version") != STAMP_VERSION:
+        return {"steps": {}, "files": {}}
+    return data
+
+
+def save_stamps(steps: Dict[str, str], files: Dict[str, list]) -> None:
+    """Temp file plus rename, so a crash never leaves half a record."""
+    try:
+        STAMP_FILE.parent.mkdir(parents=True, exist_ok=True)
+        tmp = STAMP_FILE.with_suffix(".tmp")
+        tmp.write_text(json.dumps({"version": STAMP_VERSION, "steps": steps,
+                                   "files": files}, indent=1), encoding="utf-8")
+        os.replace(tmp, STAMP_FILE)
+    except OSError as e:
+        print(f"[WARN] Could not write {STAMP_FILE}: {e}")
+
+
+# ----------------------------- running -----------------------------
+def run_step(step: Step) -> Tuple[int, str, float]:
+    argv = [sys.executable if a == "python" else a for a in step.argv]
+    t0 = time.perf_counter()
+    proc = subprocess.run(argv, cwd=PROJECT_ROOT, stdout=subprocess.PIPE,
+                          stderr=subprocess.STDOUT, text=True)
+    return proc.returncode, proc.stdout, time.perf_counter() - t0
+
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Run the stale steps of the ADictML generation pipeline.")
+    ap.add_argument("steps", nargs="*", metavar="STEP",
+                    help=f"Steps to consider (default: all of {', '.join(s.name for s in STEPS)}).")
+    ap.add_argument("--force", action="store_true", help="Run the steps even if they are up to date.")
+    ap.add_argument("--dry-run", action="store_true", help="Only report which steps would run.")
+    ap.add_argument("-j", "--jobs", type=int, default=len(STEPS),
+                    help="Steps to run at once (default: all).")
+    return ap.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = parse_args(argv)
+    by_name = {s.name: s for s in STEPS}
+    unknown = [n for n in args.steps if n not in by_name]
+    if unknown:
+        print(f"[ERROR] Unknown step(s): {', '.join(unknown)}")
+        return 2
+    chosen = [by_name[n] for n in args.steps] if args.steps else list(STEPS)
+
+    t0 = time.perf_counter()
+    stamps = load_stamps()
+    hasher = Hasher(stamps["files"])
+    prints = {s.name: fingerprint(s, hasher) for s in chosen}
+
+    stale = []
+    for s in chosen:
+        missing = [o for o in s.outputs if not (PROJECT_ROOT / o).exists()]
+        if args.force:
+            why = "forced"
+        elif missing:
+            why = f"missing {', '.join(missing)}"
+        elif stamps["steps"].get(s.name) != prints[s.name]:
+            why = "inputs changed" if s.name in stamps["steps"] else "never run"
+        else:
+            print(f"[SKIP] {s.name}: up to date")
+            continue
+        print(f"[INFO] {s.name}: {why}")
+        stale.append(s)
+
+    failed = []
+    if stale and not args.dry_run:
+        with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+            futures = {pool.submit(run_step, s): s for s in stale}
+            for fut in as_completed(futures):
+                s = futures[fut]
+                rc, out, dt = fut.result()
+                print(f"---- {s.name} ({' '.join(s.argv)}) ----")
+                print(out.rstrip("\n") or "(no output)")
+                if rc == 0:
+                    print(f"[OK] {s.name}: {dt:.2f} s")
+                    stamps["steps"][s.name] = prints[s.name]
+                else:
+                    print(f"[ERROR] {s.name}: exit status {rc} after {dt:.2f} s")
+                    stamps["steps"].pop(s.name, None)
+                    failed.append(s.name)
+
+    if not args.dry_run:
+        save_stamps(stamps["steps"], {**stamps["files"], **hasher.seen})
+    verb = "would run" if args.dry_run else "ran"
+    print(f"[INFO] Pipeline: {verb} {len(stale)} of {len(chosen)} step(s) "
+          f"in {time.perf_counter() - t0:.2f} s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,20 +11,34 @@ answers, inside the editor, the questions that otherwise cost a build:
   completion    \gls{ | \glspl{ | \Gls{ | \Glspl{   -> glossary keys
                 \citep{ | \citealp{ | \citet{       -> bib keys
                 \                                    -> macros of ml_macros.tex
+                most-used first, then names that merely hold the typed
+                letters in order (\fvec -> \featurevec)
   hover         a key shows the entry's name and the opening of its
                 description; a bib key its author/title/year; a macro its body
   definition    jump to \newglossaryentry{key}, to the Literature.bib entry,
                 or to the \newcommand in assets/ml_macros.tex
+  references    every use of a glossary key, bib key or macro in the book
   rename        rename a glossary key across every chapter file at once
                 (the featuremap -> featuretransformation kind of change)
-  diagnostics   live: \gls{} keys and \ macros that do not exist
+  diagnostics   live: \gls{} keys and \ macros that do not exist, run once
+                the buffer has been idle for DICTML_DIAGNOSTICS_DELAY_MS
+                (or initializationOptions.diagnosticsDelay, default 200)
                 on save: the fast deterministic linters, whose output is
-                already "file:line:col: CODE message"
+                already "file:line:col: CODE message"; they run side by
+                side in warm worker processes and each one's findings are
+                published as soon as it finishes
+  dictml.debugStats  (workspace/executeCommand) inbox depth, pending and
+                coalesced diagnostics passes, queued-to-published latency
 
 Speaks LSP 3.17 over stdio with no third-party dependency: the framing and
 JSON-RPC are ~60 lines below, matching the stdlib-only convention of the
 check_*.py scripts.
 
+Completion, hover, definition, references and rename are answered on a
+small thread pool from a read-only snapshot of the index, while a save
+re-indexes on a builder thread that swaps in the next snapshot when done;
+a hover never waits for a rebuild.
+
 Editor setup
 ------------
 Neovim:
@@ -40,12 +54,25 @@ Try it without an editor
 """
 from __future__ import annotations
 
+import bisect
+import collections
+import concurrent.futures
+import contextlib
 import glob
+import hashlib
+import io
+import itertools
 import json
+import multiprocessing
 import os
+import queue
 import re
-import subprocess
+import runpy
 import sys
+import threading
+import time
+
+import glossary_store
 
 HERE = os.path.dirname(os.path.abspath(__file__))
 
@@ -113,10 +140,16 @@ def entry_files(root=None):
 SAVE_LINTERS = ["check_parbreaks", "check_articles", "check_plurals",
                 "check_bullshit", "check_raw_notation", "check_margins"]
 
-GLS_RE = re.compile(r"\\(Gls|Glspl|gls|glspl)\{([^}]*)\}")
+GLS_RE = re.compile(r"\\(Gls|Glspl|gls|glspl)\{([^}\n]*)\}")
 CITE_RE = re.compile(r"\\(?:citep|citealp|citet|cite)\s*(?:\[[^\]]*\])*\{([^}]*)\}")
 MACRO_USE_RE = re.compile(r"\\([a-zA-Z]+)")
-ENTRY_RE = re.compile(r"\\newglossaryentry\{([^}]*)\}")
+ENTRY_RE = re.compile(r"\\newglossaryentry\{([^}\n]*)\}")
+SITE_KINDS = ("gls", "cite", "macro", "entry")
+# bump whenever a slice of the index changes shape, so old caches are ignored
+INDEX_CACHE_VERSION = 4
+# completion answers stop here and say isIncomplete, so the editor asks again
+COMPLETION_CAP = 200
+
 DEF_RE = re.compile(r"(?m)^\s*\\(?:newcommand|renewcommand|DeclareMathOperator)\*?\{?\\([a-zA-Z]+)\}?")
 
 # macros that come from LaTeX or loaded packages rather than ml_macros.tex
@@ -145,68 +178,398 @@ hline cline toprule midrule bottomrule captionsetup subcaption subfigure""".spli
 
 
 # ── index ─────────────────────────────────────────────────────────────
+class LineIndex:
+    """Offset -> (line, column) for one text. The line starts are a prefix
+    sum built once per file, so each lookup is a bisect instead of a count
+    of every newline from the top — which made Literature.bib quadratic."""
+
+    __slots__ = ("text", "starts")
+
+    def __init__(self, text):
+        self.text = text
+        self.starts = [0]
+        self.starts += itertools.accumulate(len(ln) + 1
+                                            for ln in text.split("\n")[:-1])
+
+    def __len__(self):
+        return len(self.starts)
+
+    def line_of(self, offset):
+        return bisect.bisect_right(self.starts, offset) - 1
+
+    def position(self, offset):
+        line = self.line_of(offset)
+        return line, offset - self.starts[line]
+
+    def line(self, n):
+        end = self.starts[n + 1] - 1 if n + 1 < len(self.starts) else None
+        return self.text[self.starts[n]:end]
+
+
 class Index:
-    """Everything the server knows, rebuilt from disk on demand."""
+    """Everything the server knows, kept in step with the files on disk.
 
-    def __init__(self):
-        self.keys = {}     # gls key   -> {file, line, name, blurb}
-        self.bib = {}      # bib key   -> {file, line, label}
-        self.macros = {}   # macro     -> {file, line, body}
-        self.build()
+    Each source file contributes its own slice of the tables (`owned`), and
+    build() re-reads only the files whose stamp moved, patching their slices
+    into keys/bib/macros/local/usage/sites in place. A save of one chapter then
+    costs one chapter, not the book plus the 690 KB bibliography.
 
-    def build(self):
-        self.keys, self.bib, self.macros = {}, {}, {}
+    With cache=True the slices and stamps also live in .dictml_cache/ under
+    the root: a new server adopts them without parsing anything and leaves
+    it to build() to re-validate them against the disk.
+
+    Readers on other threads never see an Index; they get its snapshot()."""
+
+    def __init__(self, cache=False):
+        self.keys = {}     # gls key   -> {file, line, name, blurb}
+        self.bib = {}      # bib key   -> {file, line, col, label}
+        self.macros = {}   # macro     -> {file, line, col, body}
         self.local, self.usage = set(), {}
+        # kind (gls, cite, macro, entry) -> key -> file -> [[line, col], ...]
+        self.sites = {kind: {} for kind in SITE_KINDS}
+        self.owned = {}    # file -> {roles, keys, bib, macros, local, usage, sites}
+        self.stamps = {}   # file -> [mtime_ns, size, sha1]
+        self.generation = 0  # bumped whenever the tables change
+        self.snap = None     # Snapshot of the current generation, once asked
+        self.cache = cache
+        self.from_cache = cache and self.load()
+        if not self.from_cache:
+            self.build()
+
+    def sources(self):
+        """Every file the index reads, with the tables it feeds."""
+        roles = {}
         for f in entry_files():
-            txt = open(f, encoding="utf-8", errors="replace").read()
-            starts = [0]
-            for ln in txt.split("\n"):
-                starts.append(starts[-1] + len(ln) + 1)
-            for m in ENTRY_RE.finditer(txt):
-                key = m.group(1)
-                line = txt.count("\n", 0, m.start())
-                span = txt[m.end():m.end() + 3000]
-                name = (re.search(r"name=\{([^}]*)\}", span) or [None, key])[1] \
-                    if re.search(r"name=\{([^}]*)\}", span) else key
-                desc = re.search(r"description=\{(.{0,400})", span, re.S)
-                blurb = _plain(desc.group(1)) if desc else ""
-                self.keys[key] = {"file": f, "line": line, "name": name,
-                                  "blurb": blurb}
-        if BIB and os.path.isfile(BIB):
-            txt = open(BIB, encoding="utf-8", errors="replace").read()
-            for m in re.finditer(r"(?m)^@(\w+)\s*\{\s*([^,\s]+)\s*,", txt):
-                body = txt[m.end():m.end() + 1200]
-                def field(n):
-                    mm = re.search(rf"{n}\s*=\s*\{{(.*?)\}}", body, re.S)
-                    return re.sub(r"\s+", " ", mm.group(1)).strip() if mm else ""
-                self.bib[m.group(2)] = {
-                    "file": BIB, "line": txt.count("\n", 0, m.start()),
-                    "label": f"{field('author')} ({field('year')}). "
-                             f"{field('title')}"}
-        self.local = set()
+            roles.setdefault(f, set()).update(("keys", "usage"))
+        for f in sorted(glob.glob(os.path.join(ROOT, "*.tex"))):
+            roles.setdefault(f, set()).add("sites")
         for f in sorted(glob.glob(os.path.join(ROOT, "*.tex"))) + \
                 sorted(glob.glob(os.path.join(ROOT, "assets", "*.tex"))) + \
                 ([MACROS] if MACROS else []):
-            txt = open(f, encoding="utf-8", errors="replace").read()
-            self.local |= set(re.findall(
-                r"\\(?:def|newcommand|renewcommand|providecommand|"
-                r"pgfmathsetmacro|newlength|newsavebox)\*?\{?\\([a-zA-Z]+)", txt))
-        self.usage = {}
-        for f in entry_files():
-            for name in MACRO_USE_RE.findall(
-                    open(f, encoding="utf-8", errors="replace").read()):
-                self.usage[name] = self.usage.get(name, 0) + 1
+            roles.setdefault(f, set()).add("local")
         if MACROS and os.path.isfile(MACROS):
-            txt = open(MACROS, encoding="utf-8", errors="replace").read()
-            for m in DEF_RE.finditer(txt):
-                line = txt.count("\n", 0, m.start())
-                self.macros[m.group(1)] = {
-                    "file": MACROS, "line": line,
-                    "body": txt.split("\n")[line].strip()}
+            roles[MACROS].add("macros")
+        if BIB and os.path.isfile(BIB):
+            roles.setdefault(BIB, set()).add("bib")
+        return roles
+
+    def build(self):
+        """Re-parse the files that changed since the last build (all of them
+        on the first call) and return their paths."""
+        return self.apply(self.scan())
+
+    def scan(self):
+        """What changed on disk, without touching the tables: a list of
+        (file, stamp it was compared against, new stamp, new slice), where a
+        None slice means the stamp moved but not the content and a None
+        stamp means the file is gone. Safe to run off the request thread."""
+        roles = self.sources()
+        owned, stamps = dict(self.owned), dict(self.stamps)
+        out = [(f, stamps.get(f), None, None) for f in owned if f not in roles]
+        for f in sorted(roles):
+            want = sorted(roles[f])
+            have = owned.get(f)
+            stamp, txt = _read_if_changed(f, stamps.get(f))
+            if stamp is None:                       # vanished since sources()
+                if have:
+                    out.append((f, stamps.get(f), None, None))
+                continue
+            if txt is None and have and have["roles"] == want:
+                if stamp != stamps.get(f):
+                    out.append((f, stamps.get(f), stamp, None))
+                continue
+            if txt is None:
+                txt = _read(f)[1]
+            out.append((f, stamps.get(f), stamp, _parse_source(f, txt, want)))
+        return out
+
+    def apply(self, changes):
+        """Patch the result of scan() into the tables. A change whose base
+        stamp is no longer current lost a race with a newer build and is
+        skipped. Returns the files whose slice was replaced or dropped."""
+        changed = []
+        for f, base, stamp, sl in changes:
+            if self.stamps.get(f) != base:
+                continue
+            if stamp is None:
+                self.stamps.pop(f, None)
+            else:
+                self.stamps[f] = stamp
+            if sl is None and stamp is not None:
+                continue
+            if not changed:
+                self._unshare()
+            if f in self.owned:
+                self._drop(f)
+            if sl is not None:
+                self._add(f, sl)
+            changed.append(f)
+        if changed:
+            self.local = set().union(*(s["local"] for s in self.owned.values()))
+            self.generation += 1
+        if self.cache and changes:
+            self.save()
+        return changed
+
+    def cache_file(self):
+        return os.path.join(ROOT, ".dictml_cache", "index.json")
+
+    def load(self):
+        """Adopt the slices and stamps of the last run; False when the cache
+        is missing, unreadable, or for another root or format version."""
+        try:
+            with open(self.cache_file(), encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return False
+        if data.get("version") != INDEX_CACHE_VERSION or data.get("root") != ROOT:
+            return False
+        for f, sl in data["owned"].items():
+            self._add(f, sl)
+        self.stamps = data["stamps"]
+        self.local = set().union(*(s["local"] for s in self.owned.values()))
+        return True
+
+    def save(self):
+        """Write the cache; a temp file plus rename, so a reader never sees
+        half of it and a failure only costs the next start its head start."""
+        path = self.cache_file()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "w", encoding="utf-8") as fh:
+                json.dump({"version": INDEX_CACHE_VERSION, "root": ROOT,
+                           "stamps": self.stamps, "owned": self.owned}, fh)
+            os.replace(path + ".tmp", path)
+        except OSError:
+            pass
+
+    def snapshot(self):
+        """The tables as they are now, frozen (see Snapshot)."""
+        if self.snap is None or self.snap.generation != self.generation:
+            self.snap = Snapshot(self)
+        return self.snap
+
+    def _unshare(self):
+        """Fresh copies of the tables about to change, so the snapshot of
+        the last generation keeps what it holds. One level deep is enough:
+        _add and _drop replace the per-key maps of sites, never edit them."""
+        self.keys, self.bib = dict(self.keys), dict(self.bib)
+        self.macros, self.usage = dict(self.macros), dict(self.usage)
+        self.sites = {kind: dict(tbl) for kind, tbl in self.sites.items()}
+
+    def _add(self, f, sl):
+        self.owned[f] = sl
+        self.keys.update(sl["keys"])
+        self.bib.update(sl["bib"])
+        self.macros.update(sl["macros"])
+        for name, n in sl["usage"].items():
+            self.usage[name] = self.usage.get(name, 0) + n
+        for kind, mine in sl["sites"].items():
+            tbl = self.sites[kind]
+            for key, where in mine.items():
+                tbl[key] = {**tbl.get(key, {}), f: where}
+
+    def _drop(self, f):
+        sl = self.owned.pop(f)
+        for tbl, mine in ((self.keys, sl["keys"]), (self.bib, sl["bib"]),
+                          (self.macros, sl["macros"])):
+            for k in mine:
+                if tbl.get(k, {}).get("file") == f:    # not redefined elsewhere
+                    del tbl[k]
+        for name, n in sl["usage"].items():
+            left = self.usage.get(name, 0) - n
+            if left > 0:
+                self.usage[name] = left
+            else:
+                self.usage.pop(name, None)
+        for kind, mine in sl["sites"].items():
+            tbl = self.sites[kind]
+            for key in mine:
+                rest = {g: w for g, w in tbl.get(key, {}).items() if g != f}
+                if rest:
+                    tbl[key] = rest
+                else:
+                    tbl.pop(key, None)
+
+    # the queries answer from the snapshot of the current generation
+    def known_macro(self, name):
+        return self.snapshot().known_macro(name)
+
+    def suggest(self, table, name, maxd=2):
+        return self.snapshot().suggest(table, name, maxd)
+
+    def uses(self, kind, key):
+        return self.snapshot().uses(kind, key)
+
+    def references(self, kind, key, declaration=False):
+        return self.snapshot().references(kind, key, declaration)
+
+    def complete(self, kind, prefix, cap=COMPLETION_CAP):
+        return self.snapshot().complete(kind, prefix, cap)
+
+
+class Snapshot:
+    """The tables of one generation of an Index, for the request threads.
+
+    Nothing changes a snapshot once it is made — apply() copies a table
+    before patching it — so a query sees one consistent generation however
+    long it runs, while the builder patches the next one behind it. The
+    lookup structures behind suggest() and complete() are built on first
+    use; two threads racing to build one merely build it twice."""
+
+    __slots__ = ("keys", "bib", "macros", "local", "usage", "sites",
+                 "generation", "near", "completion")
+
+    def __init__(self, idx):
+        for name in ("keys", "bib", "macros", "local", "usage", "sites",
+                     "generation"):
+            setattr(self, name, getattr(idx, name))
+        self.near = {}        # table -> NearIndex
+        self.completion = {}  # kind -> CompletionTable
 
     def known_macro(self, name):
         return name in self.macros or name in KNOWN_LATEX
 
+    def suggest(self, table, name, maxd=2):
+        """The key of `table` ("keys" or "macros") nearest to an unknown
+        `name`, within `maxd` edits."""
+        near = self.near.get(table)
+        if near is None:
+            near = self.near[table] = NearIndex(getattr(self, table))
+        return near.nearest(name, maxd)
+
+    def uses(self, kind, key):
+        """How often `key` is used as `kind`, over the whole book."""
+        return sum(map(len, self.sites[kind].get(key, {}).values()))
+
+    def references(self, kind, key, declaration=False):
+        """Every (file, line, col) where `key` is used as `kind`, in file
+        order; with `declaration`, where it is defined as well."""
+        out = []
+        if declaration:
+            if kind == "gls":
+                out += self._flat("entry", key)
+            else:
+                v = {"cite": self.bib, "macro": self.macros}[kind].get(key)
+                if v:
+                    out.append((v["file"], v["line"], v["col"]))
+        return out + self._flat(kind, key)
+
+    def _flat(self, kind, key):
+        return [(f, line, col)
+                for f, where in sorted(self.sites[kind].get(key, {}).items())
+                for line, col in where]
+
+    def complete(self, kind, prefix, cap=COMPLETION_CAP):
+        """(names, incomplete) for completion of `kind` ("gls", "cite" or
+        "macro")."""
+        table = self.completion.get(kind)
+        if table is None:
+            names, fold = {"gls": (self.keys, False), "cite": (self.bib, True),
+                           "macro": (self.macros, False)}[kind]
+            uses = {k: self.uses(kind, k) for k in names}
+            table = self.completion[kind] = CompletionTable(names, uses, fold)
+        return table.complete(prefix, cap)
+
+
+def _read(f):
+    """(stamp, text) of a source file; text with newlines normalised the way
+    open() in text mode would."""
+    with open(f, "rb") as fh:
+        data = fh.read()
+    st = os.stat(f)
+    stamp = [st.st_mtime_ns, st.st_size, hashlib.sha1(data).hexdigest()]
+    txt = data.decode("utf-8", "replace")
+    return stamp, txt.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _read_if_changed(f, old):
+    """(stamp, text) when `f` changed since stamp `old`, (stamp, None) when it
+    did not, (None, None) when it is gone. mtime and size decide for free;
+    the hash only settles a touched-but-identical file."""
+    try:
+        st = os.stat(f)
+    except OSError:
+        return None, None
+    if old and old[0] == st.st_mtime_ns and old[1] == st.st_size:
+        return old, None
+    try:
+        stamp, txt = _read(f)
+    except OSError:
+        return None, None
+    if old and old[2] == stamp[2]:
+        return stamp, None
+    return stamp, txt
+
+
+def _parse_source(f, txt, roles):
+    """The slice of the index tables that one file contributes."""
+    sl = {"roles": roles, "keys": {}, "bib": {}, "macros": {}, "local": [],
+          "usage": {}, "sites": {}}
+    li = LineIndex(txt)
+    if "keys" in roles:
+        for e in glossary_store.parse(txt, f):
+            sl["keys"][e.key] = {"file": f, "line": e.line - 1,
+                                 "name": e.field("name", e.key),
+                                 "blurb": _plain(e.field("description", ""))}
+    if "bib" in roles:
+        for m in re.finditer(r"(?m)^@(\w+)\s*\{\s*([^,\s]+)\s*,", txt):
+            body = txt[m.end():m.end() + 1200]
+            def field(n):
+                mm = re.search(rf"{n}\s*=\s*\{{(.*?)\}}", body, re.S)
+                return re.sub(r"\s+", " ", mm.group(1)).strip() if mm else ""
+            line, col = li.position(m.start(2))
+            sl["bib"][m.group(2)] = {
+                "file": f, "line": line, "col": col,
+                "label": f"{field('author')} ({field('year')}). "
+                         f"{field('title')}"}
+    if "local" in roles:
+        sl["local"] = sorted(set(re.findall(
+            r"\\(?:def|newcommand|renewcommand|providecommand|"
+            r"pgfmathsetmacro|newlength|newsavebox)\*?\{?\\([a-zA-Z]+)", txt)))
+    if "usage" in roles:
+        for name in MACRO_USE_RE.findall(txt):
+            sl["usage"][name] = sl["usage"].get(name, 0) + 1
+    if "sites" in roles:
+        sl["sites"] = _sites(txt, li)
+    if "macros" in roles:
+        for m in DEF_RE.finditer(txt):
+            line, col = li.position(m.start(1))
+            sl["macros"][m.group(1)] = {
+                "file": f, "line": line, "col": col,
+                "body": li.line(line).strip()}
+    return sl
+
+
+def _sites(txt, li):
+    """{kind: {key: [[line, col], ...]}} of one file, the column being where
+    the key itself starts. Macros of LaTeX and its packages are left out:
+    nobody asks where \\frac is used, and they are two thirds of the uses."""
+    starts, find = li.starts, bisect.bisect_right
+    sites = {kind: {} for kind in SITE_KINDS}
+
+    def scan(kind, rx, g, skip=()):
+        tbl = sites[kind]
+        for m in rx.finditer(txt):
+            key = m.group(g)
+            if key not in skip:
+                off = m.start(g)
+                line = find(starts, off) - 1
+                tbl.setdefault(key, []).append([line, off - starts[line]])
+
+    scan("gls", GLS_RE, 2)
+    scan("entry", ENTRY_RE, 1)
+    scan("macro", MACRO_USE_RE, 1, KNOWN_LATEX)
+    for m in CITE_RE.finditer(txt):
+        off = m.start(1)
+        for part in m.group(1).split(","):
+            key = part.strip()
+            if key:
+                line, col = li.position(off + part.index(key))
+                sites["cite"].setdefault(key, []).append([line, col])
+            off += len(part) + 1
+    return sites
+
 
 def _plain(tex):
     t = re.sub(r"\\(?:Gls|Glspl|gls|glspl)\{([^}]*)\}", r"\1", tex)
@@ -262,23 +625,85 @@ def context_at(line, col):
     return None, ""
 
 
-def completions(idx, kind, prefix):
+class CompletionTable:
+    """The names of one completion kind, sorted for the prefix range and
+    ranked by how often the book uses them.
+
+    A short prefix matches much of the table, so it walks the ranked list
+    and stops at `cap` hits; a long one matches a short range of the sorted
+    list, so it takes the best `cap` of that range. When the prefix itself
+    finds fewer than `cap`, names that hold its letters in order fill up
+    the rest (\\gls{gdesc -> gradientdescent), found by one regex pass over
+    the names joined in ranked order, which also stops at the cap."""
+
+    __slots__ = ("fold", "sorted", "folded", "ranked", "uses", "joined",
+                 "lowered")
+
+    def __init__(self, names, uses, fold=False):
+        self.fold = fold
+        self.uses = {n: uses.get(n, 0) for n in names}
+        self.ranked = sorted(self.uses, key=lambda n: (-self.uses[n], n))
+        rank = {n: i for i, n in enumerate(self.ranked)}
+        pairs = sorted((self._fold(n), rank[n]) for n in names)
+        self.folded = [p[0] for p in pairs]
+        self.sorted = [p[1] for p in pairs]     # rank of the i-th folded name
+        self.joined = "\n".join(self.ranked)
+        self.lowered = self.joined.lower()    # keys are ASCII: same offsets
+
+    def _fold(self, name):
+        return name.lower() if self.fold else name
+
+    def complete(self, prefix, cap=COMPLETION_CAP):
+        """(names, incomplete): prefix matches by rank, then fuzzy ones."""
+        p = self._fold(prefix)
+        lo = bisect.bisect_left(self.folded, p)
+        hi = bisect.bisect_left(self.folded, p + "\U0010ffff", lo)
+        if hi - lo <= 4 * cap:
+            ranks = sorted(self.sorted[lo:hi])
+        else:                       # dense in the ranked list: stop early
+            ranks = [r for r in itertools.islice(
+                (r for r, n in enumerate(self.ranked)
+                 if self._fold(n).startswith(p)), cap + 1)]
+        out = [self.ranked[r] for r in ranks[:cap]]
+        if len(ranks) > cap:
+            return out, True
+        if len(p) < 2:
+            return out, False
+        seen = set(out)
+        pat = re.compile("(?m)^" + "".join(          # [^\nc]*c: no backtracking
+            f"[^\\n{re.escape(c)}]*{re.escape(c)}" for c in prefix.lower())
+            + "[^\n]*")
+        for m in pat.finditer(self.lowered):
+            name = self.joined[m.start():m.end()]
+            if name not in seen:
+                if len(out) == cap:
+                    return out, True
+                out.append(name)
+        return out, False
+
+
+def completion_list(idx, kind, prefix):
+    """The CompletionList for `kind` at `prefix`; sortText keeps the rank
+    order when the editor re-sorts."""
+    names, incomplete = idx.complete(kind, prefix)
     items = []
-    if kind == "gls":
-        for k, v in idx.keys.items():
-            if k.startswith(prefix):
-                items.append({"label": k, "kind": 6, "detail": v["name"],
-                              "documentation": v["blurb"]})
-    elif kind == "cite":
-        for k, v in idx.bib.items():
-            if k.lower().startswith(prefix.lower()):
-                items.append({"label": k, "kind": 6, "detail": v["label"][:90]})
-    elif kind == "macro":
-        for k, v in idx.macros.items():
-            if k.startswith(prefix):
-                items.append({"label": k, "kind": 3, "detail": v["body"][:90],
-                              "insertText": k})
-    return sorted(items, key=lambda i: i["label"])[:200]
+    for rank, k in enumerate(names):
+        if kind == "gls":
+            v = idx.keys[k]
+            item = {"label": k, "kind": 6, "detail": v["name"],
+                    "documentation": v["blurb"]}
+        elif kind == "cite":
+            item = {"label": k, "kind": 6, "detail": idx.bib[k]["label"][:90]}
+        else:
+            item = {"label": k, "kind": 3,
+                    "detail": idx.macros[k]["body"][:90], "insertText": k}
+        item["sortText"] = f"{rank:04d}"
+        items.append(item)
+    return {"isIncomplete": incomplete, "items": items}
+
+
+def completions(idx, kind, prefix):
+    return completion_list(idx, kind, prefix)["items"]
 
 
 def token_at(text, line_no, col):
@@ -286,7 +711,10 @@ def token_at(text, line_no, col):
     lines = text.split("\n")
     if line_no >= len(lines):
         return None
-    line = lines[line_no]
+    return token_in_line(lines[line_no], col)
+
+
+def token_in_line(line, col):
     for m in GLS_RE.finditer(line):
         if m.start(2) <= col <= m.end(2):
             return "gls", m.group(2), (m.start(2), m.end(2))
@@ -313,13 +741,16 @@ def _key_at(m, line, col):
 def hover_text(idx, kind, key):
     if kind == "gls" and key in idx.keys:
         v = idx.keys[key]
-        return f"**{v['name']}**  \n`\\gls{{{key}}}` — {os.path.basename(v['file'])}:{v['line']+1}\n\n{v['blurb']}"
-    if kind == "cite" and key in idx.bib:
-        return f"**{key}**  \n{idx.bib[key]['label']}"
-    if kind == "macro" and key in idx.macros:
+        md = f"**{v['name']}**  \n`\\gls{{{key}}}` — {os.path.basename(v['file'])}:{v['line']+1}\n\n{v['blurb']}"
+    elif kind == "cite" and key in idx.bib:
+        md = f"**{key}**  \n{idx.bib[key]['label']}"
+    elif kind == "macro" and key in idx.macros:
         v = idx.macros[key]
-        return f"`\\{key}`  \n```latex\n{v['body']}\n```"
-    return None
+        md = f"`\\{key}`  \n```latex\n{v['body']}\n```"
+    else:
+        return None
+    n, files = idx.uses(kind, key), len(idx.sites[kind].get(key, {}))
+    return f"{md}\n\n*used {n} time{'s' * (n != 1)} in {files} file{'s' * (files != 1)}*"
 
 
 def location_of(idx, kind, key):
@@ -332,16 +763,55 @@ def location_of(idx, kind, key):
                       "end": {"line": v["line"], "character": 0}}}
 
 
-def _near(name, known, maxd=2):
-    """The defined macro closest to `name`, if within `maxd` edits."""
-    best, bestd = None, maxd + 1
-    for cand in known:
-        if abs(len(cand) - len(name)) > maxd or cand == name:
-            continue
-        d = _lev(name, cand, maxd)
-        if d < bestd:
-            best, bestd = cand, d
-    return best
+class NearIndex:
+    """Padded-bigram postings over a list of names, for "did you mean".
+
+    One edit breaks at most two bigrams, so a name within k edits of the
+    query shares at least max(len) + 1 - 2k of its bigrams; only names that
+    reach that count in the postings pay for a Levenshtein check. Queries
+    too short for the bound to bite fall back to the names of nearby
+    length."""
+
+    __slots__ = ("names", "postings", "by_len")
+
+    def __init__(self, names):
+        self.names = sorted(set(names))
+        self.postings = {}   # bigram -> [(name number, occurrences)]
+        self.by_len = {}     # length -> [name number]
+        for i, name in enumerate(self.names):
+            self.by_len.setdefault(len(name), []).append(i)
+            for g, n in _bigrams(name).items():
+                self.postings.setdefault(g, []).append((i, n))
+
+    def nearest(self, name, maxd=2):
+        """The closest other name within `maxd` edits (alphabetically first
+        on a tie), or None."""
+        n = len(name)
+        if n + 1 - 2 * maxd > 0:
+            shared = collections.Counter()
+            for g, k in _bigrams(name).items():
+                for i, m in self.postings.get(g, ()):
+                    shared[i] += min(k, m)
+            cands = [i for i, k in shared.items()
+                     if abs(len(self.names[i]) - n) <= maxd
+                     and k >= max(n, len(self.names[i])) + 1 - 2 * maxd]
+        else:
+            cands = [i for ln in range(n - maxd, n + maxd + 1)
+                     for i in self.by_len.get(ln, ())]
+        best, bestd = None, maxd + 1
+        for i in sorted(cands):
+            cand = self.names[i]
+            if cand == name:
+                continue
+            d = _lev(name, cand, maxd)
+            if d < bestd:
+                best, bestd = cand, d
+        return best
+
+
+def _bigrams(name):
+    padded = f"^{name}$"
+    return collections.Counter(padded[i:i + 2] for i in range(len(padded) - 1))
 
 
 def _lev(a, b, cap):
@@ -366,47 +836,130 @@ def live_diagnostics(idx, text):
     A macro that is simply unknown is NOT flagged: TikZ bodies are full of
     \\x, \\coordinate and locally defined names, and flagging those buries
     the real finding under a thousand false ones."""
+    doc = Document(text)
+    doc.refresh(idx)
+    return doc.diagnostics()
+
+
+def _line_diagnostics(idx, line, in_tikz):
+    """live_diagnostics of one line, as (c0, c1, message) triples."""
     out = []
-    tikz = _tikz_spans(text)
-    for i, line in enumerate(text.split("\n")):
-        if line.lstrip().startswith("%"):
+    if line.lstrip().startswith("%"):
+        return out
+    for m in GLS_RE.finditer(line):
+        if m.group(2) and m.group(2) not in idx.keys:
+            near = idx.suggest("keys", m.group(2))
+            hint = f" (did you mean '{near}'?)" if near else ""
+            out.append((m.start(2), m.end(2),
+                        f"unknown glossary key '{m.group(2)}'{hint} — "
+                        f"the main build fails on this"))
+    if in_tikz:
+        return out                        # TikZ has its own macro namespace
+    for m in MACRO_USE_RE.finditer(line):
+        name = m.group(1)
+        if len(name) < 4 or idx.known_macro(name) or name in idx.local:
             continue
-        for m in GLS_RE.finditer(line):
-            if m.group(2) and m.group(2) not in idx.keys:
-                near = _near(m.group(2), idx.keys)
-                hint = f" (did you mean '{near}'?)" if near else ""
-                out.append(_diag(i, m.start(2), m.end(2),
-                                 f"unknown glossary key '{m.group(2)}'{hint} — "
-                                 f"the main build fails on this", 1))
-        if i in tikz:
-            continue                      # TikZ has its own macro namespace
-        for m in MACRO_USE_RE.finditer(line):
-            name = m.group(1)
-            if len(name) < 4 or idx.known_macro(name) or name in idx.local:
-                continue
-            # a command used repeatedly across the book is established
-            # (\mbox, \tanh, \succ), whereas a typo appears once or twice
-            if idx.usage.get(name, 0) >= 3:
-                continue
-            near = _near(name, idx.macros)
-            if near:
-                out.append(_diag(i, m.start(), m.end(),
-                                 f"unknown macro \\{name} — did you mean "
-                                 f"\\{near}?", 1))
+        # a command used repeatedly across the book is established
+        # (\mbox, \tanh, \succ), whereas a typo appears once or twice
+        if idx.usage.get(name, 0) >= 3:
+            continue
+        near = idx.suggest("macros", name)
+        if near:
+            out.append((m.start(), m.end(),
+                        f"unknown macro \\{name} — did you mean \\{near}?"))
     return out
 
 
-def _tikz_spans(text):
-    """Line numbers inside a tikzpicture, where macro checking is off."""
-    inside, lines = False, set()
-    for i, line in enumerate(text.split("\n")):
-        if "\\begin{tikzpicture}" in line:
-            inside = True
-        if inside:
-            lines.add(i)
-        if "\\end{tikzpicture}" in line:
-            inside = False
-    return lines
+class Document:
+    """An open buffer as a list of lines, patched in place by the client's
+    ranged edits. Each line keeps its own diagnostics and whether it opens
+    inside a tikzpicture, so an edit re-checks the lines it touched plus
+    however far a changed \\begin/\\end{tikzpicture} moves the TikZ state —
+    work that scales with the edit, not with the 8k-line chapter."""
+
+    def __init__(self, text, version=None):
+        self.version = version
+        self.lines = text.split("\n")
+        self.inside = [False] * len(self.lines)  # in a tikzpicture at line start
+        self.diags = [[] for _ in self.lines]    # (c0, c1, message) per line
+        self.dirty = (0, len(self.lines) - 1)    # lines to re-check, inclusive
+        self.checked = None                      # (index, generation) of diags
+
+    @property
+    def text(self):
+        return "\n".join(self.lines)
+
+    def apply(self, change, utf16=True):
+        """One entry of didChange's contentChanges: a ranged edit, or the
+        whole text when the change carries no range."""
+        if "range" not in change:
+            self.__init__(change["text"], self.version)
+            return
+        r = change["range"]
+        last = len(self.lines) - 1
+        l0 = min(r["start"]["line"], last)
+        l1 = min(r["end"]["line"], last)
+        c0 = _index(self.lines[l0], r["start"]["character"], utf16)
+        c1 = _index(self.lines[l1], r["end"]["character"], utf16)
+        new = (self.lines[l0][:c0] + change["text"]
+               + self.lines[l1][c1:]).split("\n")
+        self.lines[l0:l1 + 1] = new
+        self.inside[l0:l1 + 1] = [False] * len(new)
+        self.diags[l0:l1 + 1] = [[] for _ in new]
+        shift = len(new) - (l1 - l0 + 1)
+        lo, hi = self.dirty if self.dirty else (l0, l0)
+        if hi > l1:
+            hi += shift
+        self.dirty = (min(lo, l0), max(hi, l0 + len(new) - 1))
+
+    def refresh(self, idx, limit=None):
+        """Bring the per-line diagnostics up to date with the text and with
+        `idx`; a rebuilt index re-checks every line. With `limit`, stop after
+        that many lines and return False, to be called again for the rest."""
+        if self.checked != (idx, idx.generation):
+            self.checked = (idx, idx.generation)
+            self.dirty = (0, len(self.lines) - 1)
+        if not self.dirty:
+            return True
+        lo, hi = self.dirty
+        hi = min(hi, len(self.lines) - 1)
+        self.dirty = None
+        state = False
+        if lo > 0:
+            prev = self.lines[lo - 1]
+            state = (self.inside[lo - 1] or "\\begin{tikzpicture}" in prev) \
+                and "\\end{tikzpicture}" not in prev
+        for i in range(lo, len(self.lines)):
+            if i > hi and self.inside[i] == state:
+                break                          # TikZ state has converged
+            if limit is not None and i - lo >= limit:
+                self.dirty = (i, max(i, hi))
+                return False
+            line = self.lines[i]
+            was = self.inside[i] or "\\begin{tikzpicture}" in line
+            self.inside[i] = state
+            member = state or "\\begin{tikzpicture}" in line
+            if i <= hi or member != was:
+                self.diags[i] = _line_diagnostics(idx, line, member)
+            state = member and "\\end{tikzpicture}" not in line
+        return True
+
+    def diagnostics(self):
+        return [_diag(i, c0, c1, msg, 1)
+                for i, ds in enumerate(self.diags) if ds
+                for c0, c1, msg in ds]
+
+
+def _index(line, character, utf16):
+    """Python index of an LSP character offset, which counts UTF-16 code
+    units unless the client agreed to utf-32."""
+    if not utf16 or line.isascii():
+        return character
+    i = units = 0
+    while i < len(line) and units < character:
+        units += 2 if ord(line[i]) > 0xFFFF else 1
+        i += 1
+    return i
 
 
 def _diag(line, c0, c1, msg, severity):
@@ -418,47 +971,117 @@ def _diag(line, c0, c1, msg, severity):
 LINT_LINE = re.compile(r"^(chapter_[\w]+\.tex|[\w/]+\.tex):(\d+)(?::(\d+))?:?\s*(.*)$")
 
 
+def lint_diagnostics(name, lines, path):
+    """The lines of one linter's report that concern `path`, as diagnostics."""
+    out = []
+    for raw in lines:
+        m = LINT_LINE.match(raw.strip())
+        if not m:
+            continue
+        if os.path.abspath(os.path.join(ROOT, m.group(1))) != os.path.abspath(path):
+            continue
+        line = max(0, int(m.group(2)) - 1)
+        col = max(0, int(m.group(3) or 1) - 1)
+        out.append(_diag(line, col, col + 1, f"[{name}] {m.group(4)}", 2))
+    return out
+
+
+def _run_linter(script, root, path):
+    """One linter inside a pool worker: the lines of its report.
+
+    A linter that defines lint(path), yielding its usual report lines, is
+    asked about the saved file only; any other runs as __main__ over the
+    book, exactly as from the command line, minus the interpreter start."""
+    os.chdir(root)
+    sys.argv = [script]
+    buf = io.StringIO()
+    with contextlib.redirect_stdout(buf):
+        mtime = os.stat(script).st_mtime_ns
+        ns = _LINT_MODULES.get(script)
+        if ns is None or ns[0] != mtime:
+            try:
+                ns = (mtime, runpy.run_path(script, run_name="dictml_lint"))
+            except SystemExit:
+                ns = (mtime, {})
+            if not callable(ns[1].get("lint")) and buf.getvalue():
+                # no __main__ guard: importing it was the whole run
+                return buf.getvalue().split("\n")
+            _LINT_MODULES[script] = ns
+        if callable(ns[1].get("lint")):
+            return [str(ln) for ln in ns[1]["lint"](path)]
+        try:
+            runpy.run_path(script, run_name="__main__")
+        except SystemExit:
+            pass
+    return buf.getvalue().split("\n")
+
+
+_LINT_MODULES = {}   # per worker: script -> (mtime, namespace)
+
+
+class LintRunner:
+    """The save linters, run concurrently in a pool of warm worker
+    processes instead of one fresh interpreter per linter per save."""
+
+    def __init__(self):
+        self.pool = None
+
+    def scripts(self):
+        return [(name, os.path.join(HERE, f"{name}.py")) for name in SAVE_LINTERS
+                if os.path.isfile(os.path.join(HERE, f"{name}.py"))]
+
+    def warm(self):
+        """Start the workers ahead of the first save."""
+        scripts = self.scripts()
+        if scripts and self.pool is None:
+            n = min(len(scripts), os.cpu_count() or 1)
+            # spawn, not fork: a forked child would inherit the stdin buffer
+            # lock held by the server's reader thread and hang on exit
+            self.pool = concurrent.futures.ProcessPoolExecutor(
+                max_workers=n, mp_context=multiprocessing.get_context("spawn"))
+            for _ in range(n):
+                self.pool.submit(os.getpid)
+
+    def submit(self, path):
+        """[(name, future of its report lines)] for every linter present."""
+        self.warm()
+        return [(name, self.pool.submit(_run_linter, script, ROOT, path))
+                for name, script in self.scripts()]
+
+    def shutdown(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+
+
+LINTERS = LintRunner()
+
+
 def save_diagnostics(path):
     """Run the fast deterministic linters and map their output to the file."""
     out = []
-    for name in SAVE_LINTERS:
-        script = os.path.join(HERE, f"{name}.py")
-        if not os.path.isfile(script):
-            continue
+    for name, fut in LINTERS.submit(path):
         try:
-            p = subprocess.run([sys.executable, script], cwd=ROOT,
-                               capture_output=True, timeout=90)
+            out += lint_diagnostics(name, fut.result(timeout=90), path)
         except Exception:
             continue
-        for raw in p.stdout.decode("utf-8", "replace").split("\n"):
-            m = LINT_LINE.match(raw.strip())
-            if not m:
-                continue
-            if os.path.abspath(os.path.join(ROOT, m.group(1))) != os.path.abspath(path):
-                continue
-            line = max(0, int(m.group(2)) - 1)
-            col = max(0, int(m.group(3) or 1) - 1)
-            out.append(_diag(line, col, col + 1, f"[{name}] {m.group(4)}", 2))
     return out
 
 
+def references(idx, kind, key, declaration=False):
+    """The use sites of `key` as LSP Locations, straight from the index."""
+    return [{"uri": path_to_uri(f),
+             "range": {"start": {"line": line, "character": col},
+                       "end": {"line": line, "character": col + len(key)}}}
+            for f, line, col in idx.references(kind, key, declaration)]
+
+
 def rename_edits(idx, key, new_key):
     """Every \\gls-family use plus the \\newglossaryentry header."""
     changes = {}
-    for f in entry_files() + [os.path.join(ROOT, "ListSymbols_English.tex")]:
-        if not os.path.isfile(f):
-            continue
-        edits = []
-        for i, line in enumerate(open(f, encoding="utf-8",
-                                      errors="replace").read().split("\n")):
-            for m in GLS_RE.finditer(line):
-                if m.group(2) == key:
-                    edits.append(_edit(i, m.start(2), m.end(2), new_key))
-            for m in ENTRY_RE.finditer(line):
-                if m.group(1) == key:
-                    edits.append(_edit(i, m.start(1), m.end(1), new_key))
-        if edits:
-            changes[path_to_uri(f)] = edits
+    for f, line, col in idx.references("gls", key, declaration=True):
+        changes.setdefault(path_to_uri(f), []).append(
+            _edit(line, col, col + len(key), new_key))
     return {"changes": changes}
 
 
@@ -469,26 +1092,210 @@ def _edit(line, c0, c1, text):
 
 
 # ── server loop ───────────────────────────────────────────────────────
+class DiagnosticsScheduler:
+    """When each open document is due for its live diagnostics.
+
+    An edit does not check anything; it (re)schedules its document for
+    `delay` seconds later, so a burst of keystrokes coalesces into one pass
+    and a pass queued for an older version is superseded, never run. The
+    server only runs passes that are due while no message is waiting, so
+    completion and hover never queue behind them."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.pending = {}    # uri -> (due, version, first queued at)
+        self.runs = self.coalesced = self.dropped = 0
+        self.latencies = collections.deque(maxlen=200)   # queued -> published
+
+    def schedule(self, uri, version, delay=None):
+        now = time.monotonic()
+        first = now
+        if uri in self.pending:
+            self.coalesced += 1
+            first = self.pending[uri][2]
+        self.pending[uri] = (now + (self.delay if delay is None else delay),
+                             version, first)
+
+    def next_due(self):
+        return min((p[0] for p in self.pending.values()), default=None)
+
+    def due(self):
+        """Pop the passes whose time has come: [(uri, version, queued at)]."""
+        now = time.monotonic()
+        ready = [u for u, p in self.pending.items() if p[0] <= now]
+        return [(u,) + self.pending.pop(u)[1:] for u in ready]
+
+    def stats(self):
+        lat = sorted(self.latencies)
+        return {"pending": len(self.pending), "runs": self.runs,
+                "coalesced": self.coalesced, "dropped": self.dropped,
+                "delay_ms": round(self.delay * 1000),
+                "latency_ms": {
+                    "last": round(self.latencies[-1] * 1000, 1) if lat else None,
+                    "median": round(lat[len(lat) // 2] * 1000, 1) if lat else None,
+                    "max": round(lat[-1] * 1000, 1) if lat else None}}
+
+
+# lines re-checked per slice of a diagnostics pass; between slices the server
+# looks at its inbox again, so a pass over a whole chapter cannot stall a hover
+DIAG_SLICE = 400
+REQUEST_CANCELLED = -32800
+INTERNAL_ERROR = -32603
+# read-only requests: answered on the worker pool from an index snapshot
+QUERIES = ("textDocument/completion", "textDocument/hover",
+           "textDocument/definition", "textDocument/references",
+           "textDocument/rename")
+QUERY_WORKERS = 4
+
+
 class Server:
     def __init__(self):
-        self.idx = Index()
-        self.docs = {}
-
-    def run(self):
-        stdin, stdout = sys.stdin.buffer, sys.stdout.buffer
+        self.docs = {}     # uri -> Document
+        self.lint = {}     # uri -> save-linter diagnostics of the last save
+        self.saves = {}    # uri -> number of its last save
+        self.utf16 = True  # LSP's default position encoding
+        self.out = sys.stdout.buffer
+        self.lock = threading.Lock()   # one message at a time on stdout
+        # every message, and every result of a background thread, arrives
+        # here and is handled on the main thread, which alone mutates state;
+        # queries are answered on `pool`, index builds run on `builder`
+        self.inbox = queue.Queue()
+        self.pool = concurrent.futures.ThreadPoolExecutor(
+            QUERY_WORKERS, thread_name_prefix="dictml-query")
+        self.builder = concurrent.futures.ThreadPoolExecutor(
+            1, thread_name_prefix="dictml-build")
+        self.building = None   # Future of the last build asked for
+        self.inflight = {}     # request id -> Future of its answer
+        self.sched = DiagnosticsScheduler(
+            float(os.environ.get("DICTML_DIAGNOSTICS_DELAY_MS", 200)) / 1000)
+        self.cancelled = 0
+        self.load_index()
+
+    def load_index(self):
+        """The cached index at once, re-validated against the disk by the
+        builder; a full build only when there is no cache."""
+        self.idx = Index(cache=True)
+        self.snap = self.idx.snapshot()
+        if self.idx.from_cache:
+            self.request_build()
+
+    def request_build(self):
+        """Have the builder re-read what changed on disk — unless a build
+        that has not started yet is queued already: it will see the same."""
+        b = self.building
+        if b is None or b.running() or b.done():
+            self.building = self.builder.submit(self.build, self.idx)
+
+    def build(self, idx):
+        # builder thread: once made, an Index is only touched here
+        changed = idx.build()
+        self.inbox.put({"method": "$/dictml/built", "params": {
+            "index": idx, "snapshot": idx.snapshot(), "changed": changed}})
+
+    def send(self, payload):
+        with self.lock:
+            write_message(self.out, payload)
+
+    def read_loop(self, stdin):
         while True:
             msg = read_message(stdin)
+            self.inbox.put(msg)
             if msg is None:
                 return
-            reply = self.handle(msg, stdout)
-            if reply is not None and "id" in msg:
-                write_message(stdout, {"jsonrpc": "2.0", "id": msg["id"],
-                                       "result": reply})
+
+    def run(self):
+        threading.Thread(target=self.read_loop, args=(sys.stdin.buffer,),
+                         daemon=True).start()
+        while True:
+            due = self.sched.next_due()
+            try:
+                msg = self.inbox.get(timeout=None if due is None else
+                                     max(0.0, due - time.monotonic()))
+            except queue.Empty:
+                self.run_diagnostics()
+                continue
+            batch = [msg]
+            while batch[-1] is not None:
+                try:
+                    batch.append(self.inbox.get_nowait())
+                except queue.Empty:
+                    break
+            # a cancel can only concern a request that is still queued
+            cancel = {(m.get("params") or {}).get("id") for m in batch
+                      if m and m.get("method") == "$/cancelRequest"}
+            for msg in batch:
+                if msg is None:
+                    return
+                if "id" in msg and msg["id"] in cancel and "method" in msg:
+                    self.cancel(msg["id"])
+                    continue
+                if msg.get("method") in QUERIES and "id" in msg:
+                    self.dispatch(msg)
+                    continue
+                reply = self.handle(msg, self.out)
+                if reply is not None and "id" in msg:
+                    self.send({"jsonrpc": "2.0", "id": msg["id"],
+                               "result": reply})
+
+    def cancel(self, rid):
+        self.cancelled += 1
+        self.send({"jsonrpc": "2.0", "id": rid, "error": {
+            "code": REQUEST_CANCELLED, "message": "request cancelled"}})
+
+    def dispatch(self, msg):
+        """Hand a query to the pool with what it reads fixed now: the index
+        snapshot and the text of the line under the cursor. Edits and
+        rebuilds that arrive meanwhile cannot change its answer halfway."""
+        method, params = msg["method"], msg.get("params") or {}
+        fut = self.pool.submit(self.answer, msg["id"], method, params,
+                               self.snap, self.line_at(params))
+        self.inflight[msg["id"]] = fut
+        fut.add_done_callback(lambda f, rid=msg["id"]: self.inflight.pop(rid, None))
+
+    def answer(self, rid, method, params, snap, line):
+        try:
+            reply = {"result": self.query(snap, method, params, line)}
+        except Exception as exc:             # the client still gets a reply
+            reply = {"error": {"code": INTERNAL_ERROR, "message": repr(exc)}}
+        self.send({"jsonrpc": "2.0", "id": rid, **reply})
+
+    def line_at(self, params):
+        doc = self.docs.get((params.get("textDocument") or {}).get("uri", ""))
+        line_no = (params.get("position") or {}).get("line", 0)
+        return doc.lines[line_no] if doc and line_no < len(doc.lines) else ""
+
+    def run_diagnostics(self):
+        """One slice of every due pass; an unfinished pass goes back in the
+        queue at once, behind whatever arrived in the meantime."""
+        for uri, version, queued in self.sched.due():
+            doc = self.docs.get(uri)
+            if doc is None or doc.version != version:
+                self.sched.dropped += 1
+                continue
+            if not doc.refresh(self.snap, limit=DIAG_SLICE):
+                self.sched.pending[uri] = (time.monotonic(), version, queued)
+                continue
+            self.sched.runs += 1
+            self.sched.latencies.append(time.monotonic() - queued)
+            self.publish(self.out, uri, doc.diagnostics()
+                         + self.lint.get(uri, []))
+
+    def recheck_all(self):
+        for uri, doc in self.docs.items():
+            self.sched.schedule(uri, doc.version, 0)
+
+    def debug_stats(self):
+        b = self.building
+        return {"inbox": self.inbox.qsize(), "cancelled": self.cancelled,
+                "queries": len(self.inflight),
+                "building": bool(b and not b.done()),
+                "generation": self.snap.generation,
+                "documents": len(self.docs), "diagnostics": self.sched.stats()}
 
     def publish(self, out, uri, diags):
-        write_message(out, {"jsonrpc": "2.0",
-                            "method": "textDocument/publishDiagnostics",
-                            "params": {"uri": uri, "diagnostics": diags}})
+        self.send({"jsonrpc": "2.0",
+                   "method": "textDocument/publishDiagnostics",
+                   "params": {"uri": uri, "diagnostics": diags}})
 
     def handle(self, msg, out):
         method, params = msg.get("method"), msg.get("params") or {}
@@ -497,61 +1304,142 @@ class Server:
             if root.startswith("file://"):
                 cand = uri_to_path(root)
                 if any(glob.glob(os.path.join(cand, p)) for p in ENTRY_GLOBS):
-                    set_root(cand)
-                    self.idx.build()
+                    old = ROOT
+                    if set_root(cand) != old:
+                        self.load_index()
+            encodings = ((params.get("capabilities") or {}).get("general")
+                         or {}).get("positionEncodings") or []
+            self.utf16 = "utf-32" not in encodings
+            opts = params.get("initializationOptions") or {}
+            if "diagnosticsDelay" in opts:          # milliseconds
+                self.sched.delay = float(opts["diagnosticsDelay"]) / 1000
+            LINTERS.warm()
             return {"capabilities": {
-                "textDocumentSync": 1,
+                "positionEncoding": "utf-16" if self.utf16 else "utf-32",
+                # incremental: a keystroke sends the edit, not the chapter
+                "textDocumentSync": {"openClose": True, "change": 2,
+                                     "save": {"includeText": False}},
                 "completionProvider": {"triggerCharacters": ["{", "\\", ","]},
                 "hoverProvider": True,
                 "definitionProvider": True,
                 "renameProvider": True,
+                "referencesProvider": True,
+                "executeCommandProvider": {"commands": ["dictml.debugStats"]},
             }, "serverInfo": {"name": "dictml", "version": "1.0"}}
         if method == "shutdown":
+            LINTERS.shutdown()
             return None
         if method == "exit":
-            sys.exit(0)
+            # os._exit: the reader thread is blocked on stdin, and a normal
+            # interpreter shutdown would wait on that buffer's lock
+            LINTERS.shutdown()
+            with self.lock:
+                out.flush()
+            os._exit(0)
+        if method == "$/cancelRequest":
+            # still queued on the pool: drop it; already running: let it be
+            fut = self.inflight.get(params.get("id"))
+            if fut is not None and fut.cancel():
+                self.cancel(params["id"])
+            return None
+        if method == "$/dictml/built":
+            # the swap is one assignment; queries already on the pool finish
+            # on the snapshot they were handed
+            if params["index"] is self.idx:
+                self.snap = params["snapshot"]
+                if params["changed"]:
+                    self.recheck_all()
+            return None
+        if method == "workspace/executeCommand":
+            if params.get("command") == "dictml.debugStats":
+                return self.debug_stats()
+            return None
 
         td = params.get("textDocument") or {}
         uri = td.get("uri", "")
         if method == "textDocument/didOpen":
-            self.docs[uri] = td.get("text", "")
-            self.publish(out, uri, live_diagnostics(self.idx, self.docs[uri]))
+            self.docs[uri] = Document(td.get("text", ""), td.get("version"))
+            self.sched.schedule(uri, td.get("version"), 0)
+            return None
+        if method == "textDocument/didClose":
+            self.docs.pop(uri, None)
+            self.lint.pop(uri, None)
+            self.sched.pending.pop(uri, None)
             return None
         if method == "textDocument/didChange":
-            self.docs[uri] = params["contentChanges"][-1]["text"]
-            self.publish(out, uri, live_diagnostics(self.idx, self.docs[uri]))
+            doc = self.docs.setdefault(uri, Document(""))
+            for change in params["contentChanges"]:
+                doc.apply(change, self.utf16)
+            doc.version = td.get("version")
+            self.lint.pop(uri, None)        # its line numbers no longer hold
+            self.sched.schedule(uri, doc.version)
             return None
         if method == "textDocument/didSave":
-            self.idx.build()
-            text = self.docs.get(uri, "")
-            self.publish(out, uri, live_diagnostics(self.idx, text)
-                         + save_diagnostics(uri_to_path(uri)))
+            self.request_build()
+            doc = self.docs.setdefault(uri, Document(""))
+            self.lint[uri] = []
+            self.saves[uri] = save = self.saves.get(uri, 0) + 1
+            for name, fut in LINTERS.submit(uri_to_path(uri)):
+                fut.add_done_callback(
+                    lambda f, name=name: self.inbox.put({
+                        "method": "$/dictml/linted", "params": {
+                            "uri": uri, "save": save, "name": name,
+                            "future": f}}))
+            self.sched.schedule(uri, doc.version, 0)
             return None
+        if method == "$/dictml/linted":
+            # each linter's findings are published as soon as it finishes;
+            # a report for an older save, or for a since-edited buffer, is
+            # stale and dropped
+            uri = params["uri"]
+            if self.saves.get(uri) != params["save"] or uri not in self.lint:
+                return None
+            try:
+                lines = params["future"].result()
+            except Exception:
+                return None
+            self.lint[uri] += lint_diagnostics(params["name"], lines,
+                                               uri_to_path(uri))
+            doc = self.docs.get(uri)
+            if doc is not None and uri not in self.sched.pending:
+                self.publish(out, uri, doc.diagnostics() + self.lint[uri])
+            return None
+        if method == "workspace/didChangeWatchedFiles":
+            # the client watches the sources; only the touched ones re-parse
+            self.request_build()
+            return None
+        return self.query(self.snap, method, params, self.line_at(params))
 
-        text = self.docs.get(uri, "")
-        pos = params.get("position") or {}
-        line_no, col = pos.get("line", 0), pos.get("character", 0)
-        lines = text.split("\n")
-        line = lines[line_no] if line_no < len(lines) else ""
-
+    def query(self, idx, method, params, line):
+        """The answer to a read-only request; `idx` is a Snapshot and `line`
+        the text of the cursor's line, so this runs on any thread."""
+        col = (params.get("position") or {}).get("character", 0)
         if method == "textDocument/completion":
             kind, prefix = context_at(line, col)
-            return {"isIncomplete": False,
-                    "items": completions(self.idx, kind, prefix) if kind else []}
+            if not kind:
+                return {"isIncomplete": False, "items": []}
+            return completion_list(idx, kind, prefix)
         if method == "textDocument/hover":
-            tok = token_at(text, line_no, col)
+            tok = token_in_line(line, col)
             if tok:
-                md = hover_text(self.idx, tok[0], tok[1])
+                md = hover_text(idx, tok[0], tok[1])
                 if md:
                     return {"contents": {"kind": "markdown", "value": md}}
             return None
         if method == "textDocument/definition":
-            tok = token_at(text, line_no, col)
-            return location_of(self.idx, tok[0], tok[1]) if tok else None
+            tok = token_in_line(line, col)
+            return location_of(idx, tok[0], tok[1]) if tok else None
+        if method == "textDocument/references":
+            tok = token_in_line(line, col)
+            if not tok:
+                return []
+            return references(idx, tok[0], tok[1],
+                              params.get("context", {}).get(
+                                  "includeDeclaration", False))
         if method == "textDocument/rename":
-            tok = token_at(text, line_no, col)
+            tok = token_in_line(line, col)
             if tok and tok[0] == "gls":
-                return rename_edits(self.idx, tok[1], params["newName"])
+                return rename_edits(idx, tok[1], params["newName"])
             return None
         return None
 
@@ -575,6 +1463,15 @@ def selftest():
           f"{[i['label'] for i in items][:3]}")
     ok &= any(i["label"] == "BoydConvexBook" for i in items)
 
+    # most-used first, and letters in order when no name starts with them
+    t0 = time.perf_counter()
+    res = completion_list(idx, "macro", "fvec")
+    dt = time.perf_counter() - t0
+    print(f"  fuzzy completion of '\\fvec': "
+          f"{[i['label'] for i in res['items']][:3]} in {dt * 1e3:.2f} ms")
+    ok &= bool(res["items"]) and res["items"][0]["label"] == "featurevec"
+    ok &= completion_list(idx, "gls", "")["isIncomplete"]
+
     txt = "a \\gls{convex} set and \\featurevec\n\\gls{opmethod} \\hilbertpace"
     tok = token_at(txt, 0, 9)
     print(f"  token under cursor: {tok}")
@@ -590,6 +1487,17 @@ def selftest():
     ok &= any("optmethod" in d["message"] for d in diags)
     ok &= any("hilbertspace" in d["message"] for d in diags)
 
+    # "did you mean" for every key and macro with its third letter dropped
+    t0, n = time.perf_counter(), 0
+    for table in ("keys", "macros"):
+        for k in list(getattr(idx, table)):
+            if len(k) > 4:
+                n += idx.suggest(table, k[:2] + k[3:]) is not None
+    dt = time.perf_counter() - t0
+    typos = sum(len(k) > 4 for k in list(idx.keys) + list(idx.macros))
+    print(f"  suggestion lookup: {dt / max(1, typos) * 1e6:.0f} µs per unknown "
+          f"name ({n} of {typos} typos resolved, index build included)")
+
     # noise control: a macro that resembles nothing is NOT reported, or a
     # TikZ body would bury the real findings under a thousand false ones
     quiet = live_diagnostics(idx, "\\zzzqqqmacro and \\foreach \\x in {1,2}")
@@ -601,6 +1509,21 @@ def selftest():
     print(f"  rename 'convex' would touch {n} sites in "
           f"{len(ed['changes'])} file(s)")
     ok &= n > 10
+
+    refs = references(idx, "gls", "convex", declaration=True)
+    print(f"  references to 'convex': {len(refs)} (with its header), "
+          f"hover says {idx.uses('gls', 'convex')} uses")
+    ok &= len(refs) == n and idx.uses("gls", "convex") == n - 1
+
+    # a snapshot is what a query thread reads: a build must not change it
+    snap, f = idx.snapshot(), idx.keys["convex"]["file"]
+    idx.apply([(f, idx.stamps[f], None, None)])          # as if f vanished
+    kept = "convex" in snap.keys and snap.uses("gls", "convex") == n - 1
+    gone = "convex" not in idx.keys
+    idx.build()
+    print(f"  snapshot across a rebuild: kept={kept}, index dropped={gone}, "
+          f"back={'convex' in idx.keys}")
+    ok &= kept and gone and "convex" in idx.keys
     print("\nSELFTEST", "PASS" if ok else "FAIL")
     return 0 if ok else 1
 
@@ -609,9 +1532,11 @@ def main():
     if "--selftest" in sys.argv:
         sys.exit(selftest())
     if "--index" in sys.argv:
+        t0 = time.perf_counter()
         idx = Index()
         print(f"{len(idx.keys)} glossary keys, {len(idx.bib)} bib keys, "
-              f"{len(idx.macros)} macros")
+              f"{len(idx.macros)} macros, built in "
+              f"{(time.perf_counter() - t0) * 1000:.0f} ms")
         sys.exit(0)
     Server().run()
 
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+r"""
+glossary_store.py — the book's \newglossaryentry blocks, parsed once.
+
+The language server, the MCP server, FlattenGlossary, DependencyGraph and
+countterms all need the same thing from the entry files: every entry's key,
+its key=value fields, where it sits, and which terms it \gls-references.
+This module is the one parser they share, and the one place that decides
+what an entry is:
+
+  * a single left-to-right pass per file; a % comment is skipped wherever
+    it stands, so a commented-out entry is not an entry (it is not in the
+    PDF either), and \%, \{ and \} are text, not syntax
+  * braces are matched while scanning, so a description may nest them
+  * fields are kept verbatim (comments removed); braced values lose their
+    outer braces, bare ones (type=math) are stripped of blanks
+
+load() returns an immutable Store and keeps a pickled copy under
+.dictml_cache/ at the root, keyed per file by mtime and size, so a run of
+updateit.sh parses the book once and each tool after that unpickles it.
+
+    python3 glossary_store.py            # entries per file, and the timing
+"""
+from __future__ import annotations
+
+import glob
+import os
+import pickle
+import re
+import sys
+import time
+from typing import NamedTuple
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ENTRY_GLOBS = ("ADictML_*.tex", "chapter_*.tex")
+# bump whenever Entry or the parse changes, so old caches are ignored
+STORE_VERSION = 1
+
+# at the top level only three things matter: escapes, comments, entries
+_TOP_RE = re.compile(r"\\newglossaryentry(?![a-zA-Z])|\\[^a-zA-Z]|%[^\n]*")
+_BRACE_RE = re.compile(r"\\[^a-zA-Z]|%[^\n]*|[{}]")
+_BODY_RE = re.compile(r"\\[^a-zA-Z]|%[^\n]*|[{},=]")
+_COMMENT_RE = re.compile(r"\\[^a-zA-Z]|%[^\n]*")
+_SPACE_RE = re.compile(r"(?:\s|%[^\n]*)*")
+GLS_REF_RE = re.compile(r"\\(?:gls|Gls|glspl|Glspl)\{([^{}]+)\}")
+
+
+class Entry(NamedTuple):
+    """One \\newglossaryentry. `fields` is a tuple of (name, value) pairs in
+    source order; `start`/`end` are offsets into the file, `line` is the
+    1-based line of the command; `refs` are the \\gls-family keys of the
+    body, in order, repeats included."""
+
+    key: str
+    fields: tuple
+    file: str
+    start: int
+    end: int
+    line: int
+    refs: tuple
+
+    def field(self, name, default=None):
+        """The value of field `name` — the last one, as keyval would have
+        it — or `default`."""
+        for k, v in reversed(self.fields):
+            if k == name:
+                return v
+        return default
+
+
+class Store:
+    """Every entry of a set of files, in file and source order."""
+
+    __slots__ = ("files", "entries", "by_key", "parsed")
+
+    def __init__(self, by_file, parsed=()):
+        self.files = tuple(by_file)
+        self.entries = tuple(e for f in self.files for e in by_file[f])
+        self.by_key = {e.key: e for e in self.entries}   # a later one wins
+        self.parsed = tuple(parsed)    # files not taken from the cache
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __contains__(self, key):
+        return key in self.by_key
+
+    def get(self, key, default=None):
+        return self.by_key.get(key, default)
+
+    def in_file(self, path):
+        path = os.path.abspath(path)
+        return tuple(e for e in self.entries if e.file == path)
+
+
+# ── parsing ───────────────────────────────────────────────────────────
+def parse(text, file=""):
+    """The entries of one file's text, as a tuple of Entry."""
+    out = []
+    n = len(text)
+    line, seen = 1, 0
+    m = _TOP_RE.search(text)
+    while m:
+        if m.group()[1:] != "newglossaryentry":
+            m = _TOP_RE.search(text, m.end())
+            continue
+        k0 = _SPACE_RE.match(text, m.end()).end()
+        k1 = _group_end(text, k0)
+        b0 = _SPACE_RE.match(text, k1).end() if k1 else n
+        b1, fields = _body(text, b0)
+        if b1 is None:                  # not \newglossaryentry{key}{body}
+            m = _TOP_RE.search(text, max(k1 or 0, m.end()))
+            continue
+        line += text.count("\n", seen, m.start())
+        seen = m.start()
+        out.append(Entry(
+            key=uncomment(text[k0 + 1:k1 - 1]).strip(),
+            fields=fields, file=file, start=m.start(), end=b1, line=line,
+            refs=tuple(r.strip() for r in GLS_REF_RE.findall(
+                uncomment(text[b0 + 1:b1 - 1])))))
+        m = _TOP_RE.search(text, b1)
+    return tuple(out)
+
+
+def _group_end(text, i):
+    """Offset just past the {...} group opening at `i`, or None."""
+    if i >= len(text) or text[i] != "{":
+        return None
+    depth = 0
+    for m in _BRACE_RE.finditer(text, i):
+        t = m.group()
+        if t == "{":
+            depth += 1
+        elif t == "}":
+            depth -= 1
+            if depth == 0:
+                return m.end()
+    return None
+
+
+def _body(text, i):
+    """(offset past it, fields) of the {name=value, ...} group opening at
+    `i`, or (None, ()). One scan finds the closing brace and the top-level
+    commas and equals signs; a value that is one braced group loses the
+    braces, any other value is taken as written, less its blanks."""
+    if i >= len(text) or text[i] != "{":
+        return None, ()
+    fields = []
+    depth, name, mark = 0, None, i + 1
+    v0 = g0 = g1 = None             # value start, its first group's braces
+
+    def close(end):
+        if name:
+            if g1 is not None and _blank(text, v0, g0) and _blank(text, g1, end):
+                fields.append((name, uncomment(text[g0 + 1:g1 - 1])))
+            else:
+                fields.append((name, uncomment(text[v0:end]).strip()))
+
+    for m in _BODY_RE.finditer(text, i):
+        t = m.group()
+        if t == "{":
+            depth += 1
+            if depth == 2 and g0 is None:
+                g0 = m.start()
+        elif t == "}":
+            depth -= 1
+            if depth == 1 and g1 is None:
+                g1 = m.end()
+            elif depth == 0:
+                close(m.start())
+                return m.end(), tuple(fields)
+        elif depth != 1 or len(t) > 1:      # nested, escaped or a comment
+            continue
+        elif t == "=" and name is None:
+            name = uncomment(text[mark:m.start()]).strip()
+            v0, g0, g1 = m.end(), None, None
+        elif t == ",":
+            close(m.start())
+            name, mark, g0, g1 = None, m.end(), None, None
+    return None, ()
+
+
+def _blank(text, a, b):
+    """Nothing but blanks and comments in text[a:b]."""
+    return _SPACE_RE.match(text, a, b).end() == b
+
+
+def uncomment(text):
+    """`text` without its % comments; each line keeps its newline."""
+    if "%" not in text:
+        return text
+    return _COMMENT_RE.sub(lambda m: m.group() if m.group()[0] == "\\" else "",
+                           text)
+
+
+def read(path):
+    with open(path, "rb") as fh:
+        return fh.read().decode("utf-8", "replace") \
+            .replace("\r\n", "\n").replace("\r", "\n")
+
+
+# ── the store and its cache ───────────────────────────────────────────
+def entry_files(root=None):
+    root = root or HERE
+    out = []
+    for pat in ENTRY_GLOBS:
+        out += glob.glob(os.path.join(root, pat))
+    return sorted(set(os.path.abspath(f) for f in out))
+
+
+def cache_file(root):
+    return os.path.join(root, ".dictml_cache", "glossary.pickle")
+
+
+def load(root=None, files=None, cache=True):
+    """A Store of `files` (default: the entry files under `root`, itself
+    defaulting to this script's directory). With `cache`, files whose mtime
+    and size match the pickled copy are not read at all."""
+    root = os.path.abspath(root or HERE)
+    files = [os.path.abspath(f) for f in (files or entry_files(root))]
+    old = _load_cache(root) if cache else {}
+    by_file, stamps, parsed = {}, {}, []
+    for f in files:
+        try:
+            st = os.stat(f)
+        except OSError:
+            continue
+        stamp = (st.st_mtime_ns, st.st_size)
+        hit = old.get(f)
+        if hit and hit[0] == stamp:
+            by_file[f] = hit[1]
+        else:
+            by_file[f] = parse(read(f), f)
+            parsed.append(f)
+        stamps[f] = (stamp, by_file[f])
+    if cache and parsed:
+        _save_cache(root, {**old, **stamps})
+    return Store(by_file, parsed)
+
+
+def _load_cache(root):
+    try:
+        with open(cache_file(root), "rb") as fh:
+            data = pickle.load(fh)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError,
+            ImportError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("version") != STORE_VERSION:
+        return {}
+    return data["files"]
+
+
+def _save_cache(root, files):
+    """A temp file plus rename, so a reader never sees half of it; a failure
+    only costs the next run its head start."""
+    path = cache_file(root)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", "wb") as fh:
+            pickle.dump({"version": STORE_VERSION, "files": files}, fh,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def main():
+    root = sys.argv[1] if len(sys.argv) > 1 else HERE
+    t0 = time.perf_counter()
+    store = load(root, cache=False)
+    t1 = time.perf_counter()
+    load(root)
+    t2 = time.perf_counter()
+    load(root)
+    t3 = time.perf_counter()
+    for f in store.files:
+        print(f"{os.path.basename(f):28s} {len(store.in_file(f)):4d} entries")
+    print(f"{len(store)} entries, {sum(len(e.refs) for e in store)} \\gls refs; "
+          f"parsed in {(t1 - t0) * 1e3:.0f} ms, "
+          f"cache written in {(t2 - t1) * 1e3:.0f} ms, "
+          f"read in {(t3 - t2) * 1e3:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Load test for the MCP server's HTTP/SSE transport.
+
+Opens --clients concurrent MCP client sessions against one server and has
+each make --calls tool calls, drawn from a fixed mix of lookups, searches
+and graph queries over real glossary keys. Reports the latency of each
+tool (median, 95th percentile, worst), the overall call rate, and the
+server's own status (connected clients, cache hits) at the end.
+
+With --spawn it starts `server.py --sse` on --port itself and stops it
+afterwards; otherwise it expects one listening at --url.
+
+Usage:
+    python loadtest.py --spawn --clients 16 --calls 50
+    python server.py --sse &  python loadtest.py --url http://127.0.0.1:8765/sse
+"""
+
+import argparse
+import asyncio
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+HERE = Path(__file__).resolve().parent
+KEY_RE = re.compile(r"\(`([^`]+)`\)")
+
+# (tool, weight); arguments are drawn by make_call()
+MIX = (
+    ("lookup_term", 40),
+    ("search_terms", 25),
+    ("get_related_terms", 10),
+    ("list_all_terms", 5),
+    ("get_term_neighbourhood", 10),
+    ("get_concept_path", 5),
+    ("get_prerequisites", 5),
+)
+QUERIES = ("gradient descent", "overfitting", "federated learning", "loss function",
+           "kmeans clustering", "privacy", "convex optimization", "neural network",
+           "regularization", "markov decision process", "eigenvalue", "gdpr")
+
+
+def make_call(rng: random.Random, keys: list[str]) -> tuple[str, dict]:
+    tool = rng.choices([t for t, _ in MIX], [w for _, w in MIX])[0]
+    if tool == "search_terms":
+        return tool, {"query": rng.choice(QUERIES), "top_k": 5}
+    if tool == "list_all_terms":
+        return tool, {"category": rng.choice(["", "Math", "ML Systems"])}
+    if tool == "get_concept_path":
+        return tool, {"source": rng.choice(keys), "target": rng.choice(keys)}
+    if tool == "get_term_neighbourhood":
+        return tool, {"term": rng.choice(keys), "hops": 2, "direction": "both"}
+    if tool == "get_prerequisites":
+        return tool, {"term": rng.choice(keys), "limit": 20}
+    return tool, {"term": rng.choice(keys)}
+
+
+async def client(url: str, n: int, calls: int, keys: list[str], seed: int,
+                 times: dict[str, list[float]], errors: list[str]) -> None:
+    rng = random.Random(seed + n)
+    try:
+        async with sse_client(url) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for _ in range(calls):
+                    tool, args = make_call(rng, keys)
+                    t0 = time.perf_counter()
+                    result = await session.call_tool(tool, args)
+                    times.setdefault(tool, []).append(time.perf_counter() - t0)
+                    if result.isError:
+                        errors.append(f"client {n}: {tool} {args}: {result.content}")
+    except Exception as e:                      # a refused or dropped client
+        while getattr(e, "exceptions", None):  # an exception group: its first
+            e = e.exceptions[0]
+        errors.append(f"client {n}: {type(e).__name__}: {e}")
+
+
+async def one_call(url: str, tool: str, args: dict) -> str:
+    async with sse_client(url) as (read, write):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            result = await session.call_tool(tool, args)
+            return "".join(c.text for c in result.content)
+
+
+async def wait_for_server(url: str, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await one_call(url, "server_status", {})
+            return
+        except Exception:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def pct(xs: list[float], q: float) -> float:
+    xs = sorted(xs)
+    return xs[min(len(xs) - 1, int(q * len(xs)))]
+
+
+async def run(args: argparse.Namespace) -> int:
+    await wait_for_server(args.url, args.startup_timeout)
+    t0 = time.perf_counter()
+    listing = await one_call(args.url, "list_all_terms", {})
+    print(f"[INFO] Server ready; first full listing in {time.perf_counter() - t0:.2f} s")
+    keys = KEY_RE.findall(listing)
+    if not keys:
+        print("[ERROR] The server listed no terms.")
+        return 1
+
+    times: dict[str, list[float]] = {}
+    errors: list[str] = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(args.url, n, args.calls, keys, args.seed, times, errors)
+                           for n in range(args.clients)))
+    wall = time.perf_counter() - t0
+
+    done = sum(map(len, times.values()))
+    print(f"\n{args.clients} clients x {args.calls} calls: {done} calls in {wall:.2f} s "
+          f"({done / wall:.0f} calls/s), {len(errors)} errors\n")
+    print(f"{'tool':24s} {'calls':>6s} {'median':>9s} {'p95':>9s} {'max':>9s}")
+    for tool, xs in sorted(times.items()):
+        print(f"{tool:24s} {len(xs):6d} {statistics.median(xs) * 1e3:7.1f}ms "
+              f"{pct(xs, 0.95) * 1e3:7.1f}ms {max(xs) * 1e3:7.1f}ms")
+    for e in errors[:10]:
+        print(f"[ERROR] {e}")
+    print("\n" + await one_call(args.url, "server_status", {}))
+    return 1 if errors else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Drive the MCP server's HTTP/SSE transport.")
+    ap.add_argument("--url", help="SSE endpoint (default http://127.0.0.1:PORT/sse).")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--spawn", action="store_true",
+                    help="Start server.py --sse on --port for the test.")
+    ap.add_argument("--clients", type=int, default=8, help="Concurrent sessions (default 8).")
+    ap.add_argument("--calls", type=int, default=50, help="Tool calls per session (default 50).")
+    ap.add_argument("--max-clients", type=int, help="Passed on to a spawned server.")
+    ap.add_argument("--max-calls", type=int, help="Passed on to a spawned server.")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--startup-timeout", type=float, default=60.0)
+    args = ap.parse_args()
+    args.url = args.url or f"http://127.0.0.1:{args.port}/sse"
+
+    proc = None
+    if args.spawn:
+        cmd = [sys.executable, str(HERE / "server.py"), "--sse", "--port", str(args.port)]
+        for flag in ("max_clients", "max_calls"):
+            if getattr(args, flag) is not None:
+                cmd += ["--" + flag.replace("_", "-"), str(getattr(args, flag))]
+        proc = subprocess.Popen(cmd)
+    try:
+        return asyncio.run(run(args))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,29 +1,78 @@
 """
 Aalto Dictionary of Machine Learning — MCP Server
 Parses all .tex glossary files from the ADictML repo and exposes
-them via five MCP tools: list_all_terms, lookup_term, search_terms,
-get_related_terms, get_style_guide.
+them via MCP tools: list_all_terms, lookup_term, search_terms,
+get_related_terms, get_style_guide, server_status, the batch tools
+lookup_terms and search_terms_batch, which answer many keys or queries
+in one call as JSON, and the graph tools get_term_neighbourhood,
+get_concept_path and get_prerequisites over the \gls reference graph
+(assets/glossary_network.json, or the entries' own references when that
+file is older than the glossary). search_terms is
+answered from a BM25 inverted index built at startup. Edits to the
+glossary files are picked up while the server runs: the files are polled
+every ADDICTML_POLL seconds (default 2, 0 to disable) and a changed one
+is re-parsed and swapped in. Answers of list_all_terms, lookup_term and
+get_style_guide are kept in an LRU cache of ADDICTML_CACHE_MB megabytes
+(default 16), keyed by the data's version, so a reload retires them.
+
+The server speaks stdio by default. `python server.py --sse` serves MCP
+over HTTP/SSE instead (GET /sse, POST /messages/), so one process and one
+copy of the indexes serve every client; it needs starlette and uvicorn.
+Clients beyond ADDICTML_MAX_CLIENTS are turned away with 503, and at
+most ADDICTML_MAX_CALLS tool calls are worked on at once. mcp/loadtest.py
+drives it with many concurrent clients.
+
+Startup answers the MCP handshake at once: the glossary and the style
+guides are loaded in background threads after the server starts, and a
+tool call waits only for the data it reads. Progress goes to stderr.
+`python server.py --profile-startup` loads everything in the foreground
+and reports where the time went.
 
 Location: AaltoDictionaryofML.github.io/mcp/server.py
 
 Usage:
     pip install -r requirements.txt
     python server.py
+    python server.py --sse --port 8765     # one server for many clients
 
 Register with Claude Code:
     claude mcp add --scope user aalto-dictionary \\
       -- python ~/AaltoDictionaryofML.github.io/mcp/server.py
 """
 
+import time
+_T_START = time.perf_counter()
+
 import os
 import re
+import argparse
+import sys
+import json
+import math
 import asyncio
+import heapq
+import unicodedata
+from array import array
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
 from pathlib import Path
 from difflib import SequenceMatcher
 
+_T_MCP = time.perf_counter()
 import mcp.server.stdio
 import mcp.types as types
 from mcp.server import Server
+_T_MCP = time.perf_counter() - _T_MCP
+
+# the shared entry parser lives at the root of this repository
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import glossary_store  # noqa: E402
+_T_IMPORTS = time.perf_counter()
+
+
+def log(msg: str) -> None:
+    """Progress and warnings; stdout belongs to the MCP protocol."""
+    print(msg, file=sys.stderr, flush=True)
 
 # ── Config ────────────────────────────────────────────────────────────────────
 # Repo root is one level above this file (mcp/server.py → repo root)
@@ -41,6 +90,28 @@ GLOSSARY_FILES = {
     "Regulation":            "ADictML_Regulation.tex",
 }
 
+# Seconds between checks of the glossary files for edits (0 turns it off)
+POLL_SECONDS = float(os.environ.get("ADDICTML_POLL", "2"))
+
+# The \gls reference graph written by assets/DependencyGraph.py
+GRAPH_JSON = REPO_DIR / "assets" / "glossary_network.json"
+
+# Most keys or queries one batch tool call takes
+MAX_BATCH = 2000
+
+# HTTP/SSE transport (--sse): where it listens, how many clients it holds
+# at once, and how many tool calls it works on at once (the rest queue)
+HTTP_HOST = os.environ.get("ADDICTML_HOST", "127.0.0.1")
+HTTP_PORT = int(os.environ.get("ADDICTML_PORT", "8765"))
+MAX_CLIENTS = int(os.environ.get("ADDICTML_MAX_CLIENTS", "64"))
+MAX_CALLS = int(os.environ.get("ADDICTML_MAX_CALLS", "8"))
+
+# Memory for remembered tool answers, in megabytes (0 turns the cache off)
+CACHE_MB = float(os.environ.get("ADDICTML_CACHE_MB", "16"))
+
+# Entry fields whose text also names the term (\gls, \glspl and first use)
+ALIAS_FIELDS = ("text", "first", "plural", "firstplural")
+
 # Style guide sources
 STYLE_GUIDE_PATH = Path(os.environ.get(
     "ADDICTML_STYLE_GUIDE",
@@ -61,7 +132,7 @@ def parse_ams_guide(path: Path) -> dict[str, str]:
     and the value is the full markdown content under that heading.
     """
     if not path.exists():
-        print(f"[WARN] AMS guide not found: {path}")
+        log(f"[WARN] AMS guide not found: {path}")
         return {}
 
     text = path.read_text(encoding="utf-8")
@@ -91,7 +162,7 @@ def parse_style_guide(path: Path) -> dict[str, str]:
     and the value is the full markdown content under that heading.
     """
     if not path.exists():
-        print(f"[WARN] Style guide not found: {path}")
+        log(f"[WARN] Style guide not found: {path}")
         return {}
 
     text = path.read_text(encoding="utf-8")
@@ -100,7 +171,7 @@ def parse_style_guide(path: Path) -> dict[str, str]:
     # Find the AMS style rules section
     ams_start = text.find("## AMS style rules")
     if ams_start < 0:
-        print("[WARN] No '## AMS style rules' section found in CLAUDE.md")
+        log("[WARN] No '## AMS style rules' section found in CLAUDE.md")
         return {}
 
     # Find the next ## section (end of AMS rules)
@@ -126,6 +197,7 @@ def parse_style_guide(path: Path) -> dict[str, str]:
 
 def strip_latex(text: str) -> str:
     """Remove common LaTeX commands for cleaner plain-text output."""
+    text = re.sub(r"\\(?:index|label|cite[a-z]*)(?:\[[^\]]*\])?\{[^}]*\}", "", text)  # not prose
     text = re.sub(r"\\[a-zA-Z]+\{([^}]*)\}", r"\1", text)  # \cmd{arg} → arg
     text = re.sub(r"\\[a-zA-Z]+\b", "", text)               # lone \cmd
     text = re.sub(r"[{}]", "", text)                         # stray braces
@@ -133,96 +205,750 @@ def strip_latex(text: str) -> str:
     return " ".join(text.split())                            # normalise whitespace
 
 
+def file_stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def parse_categories(repo_dir: Path, categories) -> dict[str, tuple]:
+    """
+    category -> (stamp, {key: entry}) for the given categories' files,
+    read from the shared entry store. The stamp is taken before the file
+    is read, so an edit racing the read shows up as a change next time.
+    """
+    found = {}
+    for category in categories:
+        path = repo_dir / GLOSSARY_FILES[category]
+        stamp = file_stamp(path)
+        if stamp is None:
+            log(f"[WARN] Not found: {path}")
+            continue
+        found[category] = (path, stamp)
+
+    store = glossary_store.load(repo_dir, files=[str(p) for p, _ in found.values()])
+    out = {}
+    for category, (path, stamp) in found.items():
+        entries: dict[str, dict] = {}
+        for e in store.in_file(path):
+            name = strip_latex(e.field("name", e.key).strip())
+            description = strip_latex(
+                e.field("description", e.field("text", "")).strip()
+            )
+            related_raw = e.field("see", e.field("seealso", ""))
+            related = [r.strip() for r in related_raw.split(",") if r.strip()]
+            # what \gls and friends print for the entry, besides the name
+            aliases = [strip_latex(v) for v in dict.fromkeys(
+                e.field(f, "").strip() for f in ALIAS_FIELDS) if v]
+
+            entries[e.key] = {
+                "key":         e.key,
+                "name":        name,
+                "description": description,
+                "related":     related,
+                "aliases":     aliases,
+                "refs":        list(dict.fromkeys(r for r in e.refs if r != e.key)),
+                "category":    category,
+            }
+        out[category] = (stamp, entries)
+    return out
+
+
+def merge_categories(parts: dict[str, tuple]) -> dict[str, dict]:
+    """One key -> entry map, in canonical category order (a later file wins)."""
+    entries: dict[str, dict] = {}
+    for category in GLOSSARY_FILES:
+        if category in parts:
+            entries.update(parts[category][1])
+    return entries
+
+
 def parse_glossary(repo_dir: Path) -> dict[str, dict]:
     """
-    Parse \\newglossaryentry blocks from all ADictML .tex files.
+    Load the \\newglossaryentry blocks of all ADictML .tex files from the
+    shared entry store (glossary_store.py), which parses each file once
+    and caches the result under .dictml_cache/.
 
-    Handles multi-line descriptions with nested braces, e.g.:
+    Multi-line descriptions with nested braces are handled there, e.g.:
         \\newglossaryentry{key}{
             name={Term Name},
             description={Definition text with $math$ and \\emph{emphasis}},
             see={related1, related2}
         }
     """
-    entries: dict[str, dict] = {}
-    entry_start = re.compile(r"\\newglossaryentry\{([^}]+)\}\s*\{")
+    return merge_categories(parse_categories(repo_dir, GLOSSARY_FILES))
 
-    for category, filename in GLOSSARY_FILES.items():
-        path = repo_dir / filename
-        if not path.exists():
-            print(f"[WARN] Not found: {path}")
+
+# ── Full-text search ──────────────────────────────────────────────────────────
+WORD_RE = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+STOPWORDS = frozenset("""
+    a an and are as at be by can for from how in into is it its of on or that
+    the their these this to we what when which with
+""".split())
+# irregular plurals of the book's vocabulary; everything else goes by suffix
+IRREGULAR = {"matrices": "matrix", "vertices": "vertex", "indices": "index",
+             "data": "datum", "criteria": "criterion", "hypotheses": "hypothesis"}
+NAME_WEIGHT = 3         # weight of the name field against the description
+BM25_K1, BM25_B = 1.2, 0.75
+FUZZY_MIN_DICE = 0.4    # trigram similarity for a typo to stand in for a term
+
+
+@lru_cache(maxsize=1 << 16)     # a few thousand distinct words, ~100k tokens
+def stem(word: str) -> str:
+    """
+    A light suffix stripper for the dictionary's vocabulary: folds plurals
+    and the -ing/-ed/-ation/-izer families of a word onto one form
+    (regularization, regularize, regularizer -> regulariz), leaves short
+    words, numbers and -ss/-us/-is endings (loss, bias, analysis) alone.
+    Both the index and the query go through it, so it only has to agree
+    with itself.
+    """
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if len(word) <= 3 or word.isdigit():
+        return word
+    for suffix, repl, keep in (("ies", "y", 2), ("sses", "ss", 2), ("ization", "iz", 3),
+                               ("isation", "iz", 3), ("ation", "", 3), ("izer", "iz", 3),
+                               ("ing", "", 3), ("ed", "", 3)):
+        if word.endswith(suffix) and len(word) - len(suffix) >= keep:
+            word = word[: -len(suffix)] + repl
+            break
+    else:
+        if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+            word = word[:-1]
+    if word.endswith("e") and len(word) > 4:
+        word = word[:-1]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """Stemmed tokens of plain text. A hyphenated word (k-means, t-SNE)
+    yields its parts and the joined form, so either spelling matches."""
+    out = []
+    for w in WORD_RE.findall(text.lower()):
+        if "-" not in w and "'" not in w:
+            if w not in STOPWORDS:
+                out.append(stem(w))
             continue
+        parts = w.replace("'", "").split("-")
+        if len(parts) > 1:
+            out.append(stem("".join(parts)))
+            parts = [p for p in parts if len(p) > 1]    # the k of k-means
+        out.extend(stem(p) for p in parts if p not in STOPWORDS)
+    return out
 
-        text = path.read_text(encoding="utf-8", errors="replace")
-        pos = 0
 
-        while True:
-            m = entry_start.search(text, pos)
-            if not m:
-                break
+def trigrams(term: str) -> set[str]:
+    t = f"${term}$"
+    return {t[i:i + 3] for i in range(len(t) - 2)}
 
-            key = m.group(1).strip()
-
-            # Walk forward collecting the full brace-balanced body
-            depth = 1
-            i = m.end()
-            while i < len(text) and depth > 0:
-                if text[i] == "{":
-                    depth += 1
-                elif text[i] == "}":
-                    depth -= 1
-                i += 1
-            body = text[m.end(): i - 1]
-            pos = i
-
-            # Extract named fields (one level of nested braces)
-            fields: dict[str, str] = {}
-            field_re = re.compile(
-                r"(\w+)\s*=\s*\{((?:[^{}]|\{[^{}]*\})*)\}", re.DOTALL
-            )
-            for fm in field_re.finditer(body):
-                fields[fm.group(1)] = fm.group(2).strip()
 
-            name = strip_latex(fields.get("name", key))
-            description = strip_latex(
-                fields.get("description", fields.get("text", ""))
-            )
-            related_raw = fields.get("see", fields.get("seealso", ""))
-            related = [r.strip() for r in related_raw.split(",") if r.strip()]
+class SearchIndex:
+    """
+    BM25 over the stripped description of every entry, plus a name field
+    (name and key) scored the same way with its own length normalization
+    and NAME_WEIGHT times the weight. Postings are per term a
+    {key: (description tf, name tf)} map, and idf is taken from the live
+    document frequency at query time, so entries can be added and removed
+    one at a time. Query terms missing from the vocabulary are replaced by
+    their nearest vocabulary terms by trigram Dice similarity, weighted by
+    that similarity. A score is finally scaled by 1 + the share of the
+    entry's name the query matched, so "gradient descent" ranks GD above
+    the longer names that contain it.
+    """
 
-            entries[key] = {
-                "key":         key,
-                "name":        name,
-                "description": description,
-                "related":     related,
-                "category":    category,
-            }
+    def __init__(self, entries=()):
+        self.postings: dict[str, dict[str, tuple[int, int]]] = {}
+        self.lens: dict[str, tuple[int, int]] = {}     # key -> (description, name)
+        self.total = [0, 0]
+        self.names: dict[str, frozenset[str]] = {}
+        self.terms: dict[str, tuple[str, ...]] = {}    # key -> its postings
+        self.grams: dict[str, set[str]] = {}           # trigram -> vocabulary terms
+        for e in entries:
+            self.add(e)
+
+    def __len__(self):
+        return len(self.lens)
+
+    def add(self, e: dict) -> None:
+        key = e["key"]
+        if key in self.lens:
+            self.remove(key)
+        name = tokenize(e["name"])
+        desc, named = Counter(tokenize(e["description"])), Counter(
+            name + tokenize(e["key"].replace("_", " ")))
+        for t in desc.keys() | named.keys():
+            plist = self.postings.get(t)
+            if plist is None:
+                plist = self.postings[t] = {}
+                for g in trigrams(t):
+                    self.grams.setdefault(g, set()).add(t)
+            plist[key] = (desc[t], named[t])
+        self.terms[key] = tuple(desc.keys() | named.keys())
+        self.lens[key] = (sum(desc.values()), sum(named.values()))
+        self.total[0] += self.lens[key][0]
+        self.total[1] += self.lens[key][1]
+        self.names[key] = frozenset(name)
+
+    def remove(self, key: str) -> None:
+        lens = self.lens.pop(key, None)
+        if lens is None:
+            return
+        self.total[0] -= lens[0]
+        self.total[1] -= lens[1]
+        del self.names[key]
+        for t in self.terms.pop(key):
+            plist = self.postings[t]
+            del plist[key]
+            if not plist:
+                del self.postings[t]
+                for g in trigrams(t):
+                    self.grams[g].discard(t)
+
+    def expand(self, term: str) -> list[tuple[str, float]]:
+        """(vocabulary term, weight) pairs that stand for a query term."""
+        if term in self.postings:
+            return [(term, 1.0)]
+        grams = trigrams(term)
+        shared = Counter(v for g in grams for v in self.grams.get(g, ()))
+        near = []
+        for v, n in shared.items():
+            dice = 2 * n / (len(grams) + len(v))      # len(v) trigrams in $v$
+            if dice >= FUZZY_MIN_DICE:
+                near.append((dice, v))
+        return [(v, d) for d, v in heapq.nlargest(3, near)]
+
+    def _contributions(self, term: str) -> dict[str, float]:
+        """key -> this vocabulary term's BM25 score in that entry."""
+        n_docs = len(self.lens)
+        avg_desc, avg_name = (max(1.0, t / n_docs) for t in self.total)
+
+        def part(tf, length, avg):
+            if not tf:
+                return 0.0
+            return tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg))
+
+        plist = self.postings[term]
+        idf = math.log(1 + (n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+        out = {}
+        for key, (tf_desc, tf_name) in plist.items():
+            ld, ln = self.lens[key]
+            out[key] = idf * (part(tf_desc, ld, avg_desc) + NAME_WEIGHT * part(tf_name, ln, avg_name))
+        return out
+
+    def search(self, query: str, top_k: int = 5,
+               memo: dict | None = None) -> list[tuple[float, str, set[str]]]:
+        """The top_k (score, key, matched terms), best first. Calls that
+        pass the same `memo` dict share term expansions and per-term
+        scores, so a batch of related queries does that work once."""
+        if not self.lens:
+            return []
+        memo = {} if memo is None else memo
+        scores: dict[str, float] = {}
+        matched: dict[str, set[str]] = {}
+        for q in dict.fromkeys(tokenize(query)):
+            if ("expand", q) not in memo:
+                memo["expand", q] = self.expand(q)
+            for t, w in memo["expand", q]:
+                if ("scores", t) not in memo:
+                    memo["scores", t] = self._contributions(t)
+                for key, sc in memo["scores", t].items():
+                    scores[key] = scores.get(key, 0.0) + w * sc
+                    matched.setdefault(key, set()).add(t)
+        for key, sc in scores.items():
+            name = self.names[key]
+            if name:
+                scores[key] = sc * (1 + len(name & matched[key]) / len(name))
+        best = heapq.nlargest(top_k, scores.items(), key=lambda kv: (kv[1], kv[0]))
+        return [(sc, key, matched[key]) for key, sc in best]
+
+
+@lru_cache(maxsize=4096)
+def word_stems(text: str) -> tuple[tuple[int, int, frozenset[str]], ...]:
+    """(start, end, stems) of each word of `text`; a hyphenated word has the
+    stems of its parts and of the joined form."""
+    out = []
+    for m in WORD_RE.finditer(text.lower()):
+        w = m.group().replace("'", "")
+        out.append((m.start(), m.end(),
+                    frozenset([stem(w.replace("-", ""))] + [stem(p) for p in w.split("-")])))
+    return tuple(out)
+
+
+def highlight(text: str, terms: set[str], width: int = 160) -> str:
+    """The `width`-character window of `text` holding the most words whose
+    stem is in `terms`, with those words in bold."""
+    hits = [(a, b) for a, b, stems in word_stems(text) if not stems.isdisjoint(terms)]
+    if not hits:
+        return text[:width] + ("..." if len(text) > width else "")
+    most, first, j = 0, hits[0][0], 0
+    for i, (_, end) in enumerate(hits):     # slide a window over the hits
+        while j < i and end - hits[j][0] > width - 20:
+            j += 1
+        if i - j + 1 > most:
+            most, first = i - j + 1, hits[j][0]
+    start = text.rfind(" ", 0, max(0, first - 20)) + 1 if first > 20 else 0
+    end = len(text)
+    if end - start > width:
+        end = max(text.rfind(" ", start, start + width), first + 1)
+    out, pos = [], start
+    for a, b in hits:
+        if start <= a and b <= end:
+            out.append(f"{text[pos:a]}**{text[a:b]}**")
+            pos = b
+    out.append(text[pos:end])
+    return ("..." if start else "") + "".join(out) + ("..." if end < len(text) else "")
+
+
+# ── Name resolution ───────────────────────────────────────────────────────────
+ACCENT_RE = re.compile(r"\\[`'^\"~=.]|\\[uvHc](?![a-zA-Z])")
+PAREN_RE = re.compile(r"^(.*?)\s*\(([^()]+)\)$")
+
+
+def normalize_term(text: str) -> str:
+    """
+    The spelling-insensitive form of a term: LaTeX accent commands and
+    Unicode accents dropped (Erd\\H{o}s–R\\'enyi, Erdős–Rényi -> erdos renyi),
+    dashes, hyphens and underscores read as spaces, casefolded.
+    """
+    text = unicodedata.normalize("NFKD", ACCENT_RE.sub("", text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[\s\-\u2010-\u2015_{}]+", " ", text)
+    return text.casefold().strip(" .,;:")
 
-    return entries
 
+def plural_of(name: str) -> str:
+    if name.endswith("y") and len(name) > 1 and name[-2] not in "aeiou":
+        return name[:-1] + "ies"
+    if name.endswith(("s", "x", "ch", "sh")):
+        return name + "es"
+    return name + "s"
 
-# ── Load entries and style guide at startup ──────────────────────────────────
-print(f"[INFO] Loading ADictML from {REPO_DIR} ...")
-ENTRIES = parse_glossary(REPO_DIR)
-print(f"[INFO] Loaded {len(ENTRIES)} terms across {len(GLOSSARY_FILES)} categories.")
 
-print(f"[INFO] Loading project style guide from {STYLE_GUIDE_PATH} ...")
-PROJECT_STYLE = parse_style_guide(STYLE_GUIDE_PATH)
-print(f"[INFO] Loaded {len(PROJECT_STYLE)} project style topics.")
+def build_lookup(entries: dict[str, dict]) -> dict[str, str]:
+    """
+    normalize_term(spelling) -> key, for every key, name, the name without
+    and the acronym in its trailing parenthesis ("federated learning (FL)"),
+    the \\gls aliases and the plurals of all of these. Earlier tiers win a
+    clash: keys, then names, then names' parts, then aliases, then plurals.
+    """
+    tiers: list[list[tuple[str, str]]] = [[], [], [], [], []]
+    for key, e in entries.items():
+        tiers[0].append((key, key))
+        tiers[1].append((e["name"], key))
+        m = PAREN_RE.match(e["name"])
+        if m:
+            tiers[2] += [(m.group(1), key), (m.group(2), key)]
+        tiers[3] += [(a, key) for a in e.get("aliases", ())]
+        tiers[4] += [(plural_of(s), key) for s, _ in
+                     [(e["name"], key)] + ([(m.group(1), key)] if m else [])]
+    lookup: dict[str, str] = {}
+    for tier in tiers:
+        for spelling, key in tier:
+            norm = normalize_term(spelling)
+            if norm:
+                lookup.setdefault(norm, key)
+    return lookup
+
+
+# ── Concept graph ─────────────────────────────────────────────────────────────
+class ConceptGraph:
+    """
+    The \\gls reference graph (term -> the terms its definition uses) as
+    compressed sparse rows: node i's successors are out_to[out_off[i]:
+    out_off[i + 1]], and likewise its predecessors in in_to. Strongly
+    connected components are computed once (Tarjan), numbered sinks first,
+    so sorting by component puts every term after the terms it depends on.
+    BFS trees are computed per (source, direction) on first use and kept.
+    """
+
+    BFS_CACHE = 1024
+
+    def __init__(self, edges: dict[str, list[str]], names: dict[str, str], source: str):
+        keys = sorted(set(edges).union(*edges.values()))
+        self.keys = keys
+        self.index = {k: i for i, k in enumerate(keys)}
+        self.names = names
+        self.source = source
+        pairs = sorted({(self.index[u], self.index[v])
+                        for u, vs in edges.items() for v in vs if u != v})
+        self.out_off, self.out_to = self._csr(len(keys), pairs)
+        self.in_off, self.in_to = self._csr(len(keys), sorted((v, u) for u, v in pairs))
+        self.n_edges = len(pairs)
+        self.comp = self._tarjan()
+        self._bfs: dict[tuple[int, str], array] = {}
+
+    @staticmethod
+    def _csr(n: int, pairs) -> tuple[array, array]:
+        off, to = array("i", [0] * (n + 1)), array("i", (v for _, v in pairs))
+        for u, _ in pairs:
+            off[u + 1] += 1
+        for i in range(n):
+            off[i + 1] += off[i]
+        return off, to
+
+    def succ(self, i: int, direction: str = "out"):
+        if direction == "in":
+            return self.in_to[self.in_off[i]:self.in_off[i + 1]]
+        if direction == "both":
+            return (self.out_to[self.out_off[i]:self.out_off[i + 1]]
+                    + self.in_to[self.in_off[i]:self.in_off[i + 1]])
+        return self.out_to[self.out_off[i]:self.out_off[i + 1]]
+
+    def _tarjan(self) -> array:
+        """Component number of every node, iteratively (no recursion limit)."""
+        n = len(self.keys)
+        index, low = array("i", [-1] * n), array("i", [0] * n)
+        comp, on_stack = array("i", [-1] * n), bytearray(n)
+        stack, counter, n_comp = [], 0, 0
+        for root in range(n):
+            if index[root] >= 0:
+                continue
+            work = [(root, self.out_off[root])]
+            index[root] = low[root] = counter
+            counter += 1
+            stack.append(root)
+            on_stack[root] = 1
+            while work:
+                v, pos = work[-1]
+                if pos < self.out_off[v + 1]:
+                    work[-1] = (v, pos + 1)
+                    w = self.out_to[pos]
+                    if index[w] < 0:
+                        index[w] = low[w] = counter
+                        counter += 1
+                        stack.append(w)
+                        on_stack[w] = 1
+                        work.append((w, self.out_off[w]))
+                    elif on_stack[w]:
+                        low[v] = min(low[v], index[w])
+                    continue
+                work.pop()
+                if work:
+                    u = work[-1][0]
+                    low[u] = min(low[u], low[v])
+                if low[v] == index[v]:
+                    while True:
+                        w = stack.pop()
+                        on_stack[w] = 0
+                        comp[w] = n_comp
+                        if w == v:
+                            break
+                    n_comp += 1
+        return comp
+
+    def bfs(self, i: int, direction: str = "out") -> array:
+        """Parent of every node in the BFS tree from i (-1: unreached,
+        i itself: the root)."""
+        tree = self._bfs.get((i, direction))
+        if tree is None:
+            tree = array("i", [-1] * len(self.keys))
+            tree[i] = i
+            queue = deque([i])
+            while queue:
+                v = queue.popleft()
+                for w in self.succ(v, direction):
+                    if tree[w] < 0:
+                        tree[w] = v
+                        queue.append(w)
+            if len(self._bfs) >= self.BFS_CACHE:
+                self._bfs.clear()
+            self._bfs[i, direction] = tree
+        return tree
+
+    def neighbourhood(self, key: str, hops: int, direction: str = "out") -> list[list[str]]:
+        """The keys at distance 1, 2, ..., hops from key."""
+        start = self.index[key]
+        seen, frontier, rings = {start}, [start], []
+        for _ in range(hops):
+            nxt = []
+            for v in frontier:
+                for w in self.succ(v, direction):
+                    if w not in seen:
+                        seen.add(w)
+                        nxt.append(w)
+            if not nxt:
+                break
+            rings.append(sorted(self.keys[w] for w in nxt))
+            frontier = nxt
+        return rings
+
+    def path(self, a: str, b: str, direction: str = "out") -> list[str] | None:
+        """A shortest chain of keys from a to b, or None."""
+        i, j = self.index[a], self.index[b]
+        tree = self.bfs(i, direction)
+        if tree[j] < 0:
+            return None
+        chain = [j]
+        while chain[-1] != i:
+            chain.append(tree[chain[-1]])
+        return [self.keys[v] for v in reversed(chain)]
+
+    def prerequisites(self, key: str) -> list[list[str]]:
+        """Every term key's definition depends on, directly or not, grouped
+        by component and ordered so that a group comes after all groups it
+        depends on. A group of more than one key is a definitional cycle."""
+        i = self.index[key]
+        tree = self.bfs(i)
+        groups: dict[int, list[str]] = {}
+        for v, parent in enumerate(tree):
+            if parent >= 0 and v != i:
+                groups.setdefault(self.comp[v], []).append(self.keys[v])
+        return [sorted(groups[c]) for c in sorted(groups)]
+
+
+def build_graph(entries: dict[str, dict], prefer_json: bool = True) -> ConceptGraph:
+    """
+    The graph DependencyGraph.py exported, if it is at least as new as
+    every glossary file; otherwise (and after a hot reload) the same
+    graph built from the entries' \\gls references.
+    """
+    names = {k: e["name"] for k, e in entries.items()}
+    newest = max((file_stamp(REPO_DIR / f) or (0, 0))[0] for f in GLOSSARY_FILES.values())
+    json_stamp = file_stamp(GRAPH_JSON)
+    if prefer_json and json_stamp and json_stamp[0] >= newest:
+        try:
+            data = json.loads(GRAPH_JSON.read_text(encoding="utf-8"))
+            edges: dict[str, list[str]] = {n["id"]: [] for n in data["nodes"]}
+            for e in data["edges"]:
+                edges.setdefault(e["source"], []).append(e["target"])
+            for n in data["nodes"]:
+                names.setdefault(n["id"], n.get("name") or n["id"])
+            return ConceptGraph(edges, names, GRAPH_JSON.name)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            log(f"[WARN] Could not read {GRAPH_JSON}: {e}; using \\gls references")
+    edges = {k: [r for r in e["refs"] if r in entries] for k, e in entries.items()}
+    return ConceptGraph(edges, names, "\\gls references")
+
+
+# ── Response cache ────────────────────────────────────────────────────────────
+class ResponseCache:
+    """
+    Formatted tool answers, least recently used first out, bounded by the
+    size of the text they hold. Keys carry the version of the data the
+    answer was made from; bump() moves a source to a new version and drops
+    every answer made from the old one.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.items: OrderedDict[tuple, tuple[str, int]] = OrderedDict()
+        self.bytes = 0
+        self.versions: dict[str, int] = {}
+        self.hits = self.misses = self.evictions = 0
+
+    def key(self, source: str, *args) -> tuple:
+        return (source, self.versions.get(source, 0)) + args
+
+    def get(self, key: tuple) -> str | None:
+        item = self.items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self.items.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key: tuple, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        old = self.items.pop(key, None)
+        if old is not None:
+            self.bytes -= old[1]
+        self.items[key] = (text, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, dropped) = self.items.popitem(last=False)
+            self.bytes -= dropped
+            self.evictions += 1
+
+    def bump(self, source: str) -> None:
+        self.versions[source] = self.versions.get(source, 0) + 1
+        for k in [k for k in self.items if k[0] == source]:
+            self.bytes -= self.items.pop(k)[1]
+
+    def summary(self) -> str:
+        looked = self.hits + self.misses
+        rate = f", {100 * self.hits / looked:.0f}% hit" if looked else ""
+        return (f"{len(self.items)} answers, {self.bytes / 1024:.0f} of "
+                f"{self.max_bytes / 1024:.0f} KiB; {self.hits} hits, "
+                f"{self.misses} misses{rate}, {self.evictions} evicted")
+
+
+RESPONSES = ResponseCache(int(CACHE_MB * (1 << 20)))
+
+
+def cache_key(name: str, arguments: dict) -> tuple | None:
+    """The cache key of a call, its arguments normalized the way the tool
+    reads them, or None for tools whose answers are not cached."""
+    if name == "list_all_terms":
+        return RESPONSES.key("glossary", name, arguments.get("category", "").strip().lower())
+    if name == "lookup_term":
+        return RESPONSES.key("glossary", name, arguments.get("term", "").strip())
+    if name == "get_style_guide":
+        return RESPONSES.key("style", name, arguments.get("topic", "").strip().lower())
+    return None
 
-print(f"[INFO] Loading AMS style guide from {AMS_GUIDE_PATH} ...")
-AMS_STYLE = parse_ams_guide(AMS_GUIDE_PATH)
-print(f"[INFO] Loaded {len(AMS_STYLE)} AMS style topics.")
 
-# Merged index: project rules take precedence, AMS rules fill in the rest.
-# Keys are prefixed with source for disambiguation.
+# ── Loading ───────────────────────────────────────────────────────────────────
+# Empty until the background loads finish; tool calls await need() first.
+CATEGORIES: dict[str, tuple] = {}
+ENTRIES: dict[str, dict] = {}
+SEARCH = SearchIndex()
+LOOKUP: dict[str, str] = {}
+GRAPH = ConceptGraph({}, {}, "nothing")
 STYLE_GUIDE: dict[str, str] = {}
-for k, v in PROJECT_STYLE.items():
-    STYLE_GUIDE[k] = v
-for k, v in AMS_STYLE.items():
-    ams_key = f"ams: {k}"
-    STYLE_GUIDE[ams_key] = v
-print(f"[INFO] Combined style index: {len(STYLE_GUIDE)} topics.")
+LOAD_MS: dict[str, float] = {}          # step -> milliseconds
+
+
+def load_glossary_data() -> tuple:
+    """Parse the glossary and build its indexes. Runs in a worker thread
+    and touches no globals, so the result can be swapped in whole."""
+    log(f"[INFO] Loading ADictML from {REPO_DIR} ...")
+    t0 = time.perf_counter()
+    categories = parse_categories(REPO_DIR, GLOSSARY_FILES)
+    entries = merge_categories(categories)
+    t1 = time.perf_counter()
+    search, lookup = SearchIndex(entries.values()), build_lookup(entries)
+    graph = build_graph(entries)
+    t2 = time.perf_counter()
+    LOAD_MS.update(parse=(t1 - t0) * 1e3, index=(t2 - t1) * 1e3,
+                   glossary=(t2 - t0) * 1e3)
+    log(f"[INFO] Loaded {len(entries)} terms across {len(categories)} categories; "
+        f"search index: {len(search.postings)} terms, {len(lookup)} spellings; "
+        f"graph: {len(graph.keys)} nodes, {graph.n_edges} edges from {graph.source}.")
+    return categories, entries, search, lookup, graph
+
+
+def load_style_data() -> dict[str, str]:
+    """Both style guides, merged. Runs in a worker thread."""
+    t0 = time.perf_counter()
+    log(f"[INFO] Loading project style guide from {STYLE_GUIDE_PATH} ...")
+    project_style = parse_style_guide(STYLE_GUIDE_PATH)
+    log(f"[INFO] Loading AMS style guide from {AMS_GUIDE_PATH} ...")
+    ams_style = parse_ams_guide(AMS_GUIDE_PATH)
+
+    # Merged index: project rules take precedence, AMS rules fill in the rest.
+    # Keys are prefixed with source for disambiguation.
+    style_guide: dict[str, str] = {}
+    for k, v in project_style.items():
+        style_guide[k] = v
+    for k, v in ams_style.items():
+        ams_key = f"ams: {k}"
+        style_guide[ams_key] = v
+    LOAD_MS["style"] = (time.perf_counter() - t0) * 1e3
+    log(f"[INFO] Style index: {len(project_style)} project + {len(ams_style)} AMS topics.")
+    return style_guide
+
+
+async def _load_glossary() -> None:
+    global CATEGORIES, ENTRIES, SEARCH, LOOKUP, GRAPH
+    CATEGORIES, ENTRIES, SEARCH, LOOKUP, GRAPH = await asyncio.to_thread(load_glossary_data)
+    RESPONSES.bump("glossary")
+
+
+async def _load_style() -> None:
+    global STYLE_GUIDE
+    STYLE_GUIDE = await asyncio.to_thread(load_style_data)
+    RESPONSES.bump("style")
+
+
+LOADERS = {"glossary": _load_glossary, "style": _load_style}
+_LOADING: dict[str, asyncio.Task] = {}
+
+
+def start_loading(*names: str) -> None:
+    """Start the named loads (default: all) unless already under way."""
+    loop = asyncio.get_running_loop()
+    for name in names or LOADERS:
+        if name not in _LOADING:
+            _LOADING[name] = loop.create_task(LOADERS[name]())
+
+
+async def need(name: str) -> None:
+    """Wait until the named data is loaded (starting the load if need be).
+    A failed load raises here, for every call that needs it."""
+    start_loading(name)
+    await asyncio.shield(_LOADING[name])
+
+
+def load_state(name: str) -> str:
+    task = _LOADING.get(name)
+    if task is None:
+        return "not started"
+    if not task.done():
+        return "loading"
+    if task.exception() is not None:
+        return f"failed ({task.exception()})"
+    return f"ready in {LOAD_MS.get(name, 0):.0f} ms"
+
+
+# ── Hot reload ────────────────────────────────────────────────────────────────
+RELOAD_STATS = {"reloads": 0, "last_reload": None, "last_files": [],
+                "last_ms": 0.0, "last_error": None}
+
+
+def changed_categories() -> list[str]:
+    """Categories whose file's mtime or size differs from when it was read."""
+    return [c for c, f in GLOSSARY_FILES.items()
+            if file_stamp(REPO_DIR / f) != (CATEGORIES[c][0] if c in CATEGORIES else None)]
+
+
+def apply_reload(changed: list[str], parts: dict[str, tuple]) -> tuple[int, int, int]:
+    """
+    Swap re-parsed categories in. Runs on the event loop with no await, so
+    a tool call sees either the old glossary or the new one, never a mix.
+    The search index is patched entry by entry; the lookup table and the
+    graph (now from the entries' \\gls references, as the exported one is
+    stale) are cheap enough to rebuild. Returns (added, changed, removed)
+    entry counts.
+    """
+    global CATEGORIES, ENTRIES, LOOKUP, GRAPH
+    categories = dict(CATEGORIES)
+    for c in changed:
+        if c in parts:
+            categories[c] = parts[c]
+        else:                               # the file went away
+            categories.pop(c, None)
+    old, new = ENTRIES, merge_categories(categories)
+    removed = old.keys() - new.keys()
+    updated = [k for k, e in new.items() if old.get(k) != e]
+    for k in removed:
+        SEARCH.remove(k)
+    for k in updated:
+        SEARCH.add(new[k])
+    CATEGORIES, ENTRIES, LOOKUP = categories, new, build_lookup(new)
+    GRAPH = build_graph(new, prefer_json=False)
+    RESPONSES.bump("glossary")
+    added = sum(1 for k in updated if k not in old)
+    return added, len(updated) - added, len(removed)
+
+
+async def watch_glossary() -> None:
+    """Poll the glossary files and reload the ones that changed. Parsing
+    runs in a worker thread; only the swap happens on the loop."""
+    await need("glossary")
+    while True:
+        await asyncio.sleep(POLL_SECONDS)
+        changed = changed_categories()
+        if not changed:
+            continue
+        t0 = time.perf_counter()
+        try:
+            parts = await asyncio.to_thread(parse_categories, REPO_DIR, changed)
+        except Exception as e:              # keep serving the old entries
+            RELOAD_STATS["last_error"] = f"{type(e).__name__}: {e}"
+            log(f"[WARN] Reload of {', '.join(changed)} failed: {e}")
+            continue
+        added, updated, removed = apply_reload(changed, parts)
+        RELOAD_STATS.update(reloads=RELOAD_STATS["reloads"] + 1,
+                            last_reload=time.time(), last_files=changed,
+                            last_ms=(time.perf_counter() - t0) * 1e3, last_error=None)
+        log(f"[INFO] Reloaded {', '.join(changed)}: +{added} ~{updated} -{removed} "
+            f"terms in {RELOAD_STATS['last_ms']:.0f} ms")
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
@@ -231,23 +957,91 @@ def fuzzy_score(query: str, text: str) -> float:
 
 
 def resolve(term: str) -> dict | None:
-    """Resolve a term by exact key first, then case-insensitive name match."""
+    """Resolve a term by exact key first, then by any of its spellings."""
     if term in ENTRIES:
         return ENTRIES[term]
-    tl = term.lower()
-    for e in ENTRIES.values():
-        if e["name"].lower() == tl:
-            return e
-    return None
+    key = LOOKUP.get(normalize_term(term))
+    return ENTRIES.get(key) if key else None
 
 
-def fmt_entry(e: dict, snippet_len: int = 150) -> str:
-    desc = e["description"]
-    if len(desc) > snippet_len:
+def fmt_entry(e: dict, snippet_len: int = 150, snippet: str | None = None) -> str:
+    desc = snippet if snippet is not None else e["description"]
+    if snippet is None and len(desc) > snippet_len:
         desc = desc[:snippet_len] + "..."
     return f"- **{e['name']}** (`{e['key']}`, {e['category']}): {desc}"
 
 
+def lookup_batch(terms: list[str]) -> dict:
+    """lookup_terms: every term resolved once per distinct spelling."""
+    seen: dict[str, dict | None] = {}
+    results, missing = [], []
+    for term in terms:
+        term = str(term).strip()
+        norm = normalize_term(term)
+        if norm not in seen:
+            seen[norm] = resolve(term)
+        e = seen[norm]
+        if e is None:
+            missing.append(term)
+            results.append({"query": term, "found": False})
+        else:
+            results.append({"query": term, "found": True, "key": e["key"],
+                            "name": e["name"], "category": e["category"],
+                            "description": e["description"], "related": e["related"]})
+    return {"count": len(results), "found": len(results) - len(missing),
+            "missing": missing, "results": results}
+
+
+def search_batch(queries: list[str], top_k: int, snippets: bool) -> dict:
+    """search_terms_batch: one shared memo for expansions and per-term
+    scores, and each distinct query (by its tokens) ranked once."""
+    memo: dict = {}
+    ranked: dict[tuple, list[dict]] = {}
+    results = []
+    for query in queries:
+        query = str(query).strip()
+        sig = tuple(sorted(set(tokenize(query))))
+        if sig not in ranked:
+            hits = []
+            for score, key, terms in SEARCH.search(query, top_k, memo):
+                e = ENTRIES[key]
+                hit = {"key": key, "name": e["name"], "category": e["category"],
+                       "score": round(score, 3)}
+                if snippets:
+                    snip = ("snippet", key, frozenset(terms))
+                    if snip not in memo:
+                        memo[snip] = highlight(e["description"], terms)
+                    hit["snippet"] = memo[snip]
+                hits.append(hit)
+            ranked[sig] = hits
+        results.append({"query": query, "hits": ranked[sig]})
+    return {"count": len(results), "distinct": len(ranked), "results": results}
+
+
+def graph_node(term: str) -> str | None:
+    """The graph key for a term: resolved through the glossary, or a key
+    only the exported graph has."""
+    e = resolve(term)
+    key = e["key"] if e else term
+    return key if key in GRAPH.index else None
+
+
+def graph_label(key: str) -> str:
+    return f"{GRAPH.names.get(key, key)} (`{key}`)"
+
+
+def batch_arg(arguments: dict, name: str) -> list[str] | str:
+    """The list argument of a batch tool, or an error message."""
+    items = arguments.get(name)
+    if isinstance(items, str):
+        items = [items]
+    if not isinstance(items, list) or not items:
+        return f"'{name}' must be a non-empty list of strings."
+    if len(items) > MAX_BATCH:
+        return f"At most {MAX_BATCH} {name} per call (got {len(items)})."
+    return items
+
+
 # ── MCP Server ────────────────────────────────────────────────────────────────
 server = Server("aalto-dictionary")
 
@@ -293,8 +1087,9 @@ async def list_tools() -> list[types.Tool]:
         types.Tool(
             name="search_terms",
             description=(
-                "Fuzzy/keyword search across term names and descriptions. "
-                "Returns the top matching terms with short snippets."
+                "Ranked keyword search (BM25) across term names and descriptions, "
+                "tolerant of plurals, word forms and typos. Returns the top matching "
+                "terms with snippets, matched words in bold."
             ),
             inputSchema={
                 "type": "object",
@@ -354,12 +1149,149 @@ async def list_tools() -> list[types.Tool]:
                 "required": [],
             },
         ),
+        types.Tool(
+            name="lookup_terms",
+            description=(
+                "Batch form of lookup_term: resolve many glossary keys or display "
+                "names in one call. Returns JSON with one result per input, in order "
+                "(found, key, name, category, description, related), and the "
+                "list of inputs that were not found."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "terms": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Glossary keys or display names",
+                    }
+                },
+                "required": ["terms"],
+            },
+        ),
+        types.Tool(
+            name="search_terms_batch",
+            description=(
+                "Batch form of search_terms: run many queries in one call. Returns "
+                "JSON with the ranked hits (key, name, category, score, and "
+                "optionally a snippet) for each query, in order."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Search queries",
+                    },
+                    "top_k": {
+                        "type": "integer",
+                        "description": "Maximum hits per query (default 5)",
+                        "default": 5,
+                    },
+                    "snippets": {
+                        "type": "boolean",
+                        "description": "Include highlighted snippets (default true)",
+                        "default": True,
+                    },
+                },
+                "required": ["queries"],
+            },
+        ),
+        types.Tool(
+            name="get_term_neighbourhood",
+            description=(
+                "Terms within k hops of a term in the \\gls reference graph, grouped "
+                "by distance. direction 'out' follows the terms its definition uses, "
+                "'in' the terms whose definitions use it, 'both' either."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "term": {"type": "string", "description": "Glossary key or display name"},
+                    "hops": {"type": "integer", "description": "Maximum distance (default 2)",
+                             "default": 2},
+                    "direction": {"type": "string", "enum": ["out", "in", "both"],
+                                  "default": "out"},
+                },
+                "required": ["term"],
+            },
+        ),
+        types.Tool(
+            name="get_concept_path",
+            description=(
+                "A shortest chain of definitions leading from one term to another "
+                "in the \\gls reference graph (each term's definition uses the next). "
+                "Falls back to a path ignoring edge direction if there is none."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "source": {"type": "string", "description": "Starting term"},
+                    "target": {"type": "string", "description": "Term to reach"},
+                },
+                "required": ["source", "target"],
+            },
+        ),
+        types.Tool(
+            name="get_prerequisites",
+            description=(
+                "Every term a term's definition depends on, directly or through "
+                "other definitions, in reading order: each term comes after the "
+                "terms it depends on. Mutually dependent terms are grouped."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "term": {"type": "string", "description": "Glossary key or display name"},
+                    "limit": {"type": "integer",
+                              "description": "Maximum number of terms to list (default 100)",
+                              "default": 100},
+                },
+                "required": ["term"],
+            },
+        ),
+        types.Tool(
+            name="server_status",
+            description=(
+                "Diagnostics: terms per category, search index size, and how often "
+                "and when the glossary was last reloaded after an edit."
+            ),
+            inputSchema={"type": "object", "properties": {}, "required": []},
+        ),
     ]
 
 
 @server.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
-
+    if CALL_SLOTS is None:
+        return await respond(name, arguments)
+    TRANSPORT["waiting"] += 1
+    async with CALL_SLOTS:
+        TRANSPORT["waiting"] -= 1
+        TRANSPORT["calls"] += 1
+        return await respond(name, arguments)
+
+
+async def respond(name: str, arguments: dict) -> list[types.TextContent]:
+    """Wait for the data a tool reads, then answer from the cache or afresh."""
+    if name == "get_style_guide":
+        await need("style")
+    elif name != "server_status":
+        await need("glossary")
+    key = cache_key(name, arguments) if RESPONSES.max_bytes > 0 else None
+    if key is None:
+        return answer(name, arguments)
+    text = RESPONSES.get(key)
+    if text is None:
+        result = answer(name, arguments)
+        RESPONSES.put(key, "".join(c.text for c in result))
+        return result
+    return [types.TextContent(type="text", text=text)]
+
+
+def answer(name: str, arguments: dict) -> list[types.TextContent]:
+    """The answer to one tool call, once the data it reads is loaded."""
     # ── list_all_terms ────────────────────────────────────────────────────────
     if name == "list_all_terms":
         category = arguments.get("category", "").strip()
@@ -410,26 +1342,14 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
         query = arguments.get("query", "").strip()
         top_k = max(1, int(arguments.get("top_k", 5)))
 
-        scored: list[tuple[float, dict]] = []
-        for entry in ENTRIES.values():
-            score = max(
-                fuzzy_score(query, entry["name"]),
-                fuzzy_score(query, entry["description"]),
-            )
-            # Boost exact substring matches
-            if query.lower() in entry["name"].lower() or \
-               query.lower() in entry["description"].lower():
-                score = max(score, 0.85)
-            scored.append((score, entry))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        top = [e for s, e in scored[:top_k] if s > 0.2]
-
+        top = SEARCH.search(query, top_k)
         if not top:
             return [types.TextContent(type="text", text=f"No results for '{query}'.")]
 
         lines = [f"**Top {len(top)} results for '{query}':**\n"]
-        lines += [fmt_entry(e) for e in top]
+        for _, key, terms in top:
+            e = ENTRIES[key]
+            lines.append(fmt_entry(e, snippet=highlight(e["description"], terms)))
         return [types.TextContent(type="text", text="\n".join(lines))]
 
     # ── get_related_terms ─────────────────────────────────────────────────────
@@ -493,14 +1413,240 @@ async def call_tool(name: str, arguments: dict) -> list[types.TextContent]:
         return [types.TextContent(type="text",
             text=f"No style topic matching '{topic}'. Available: {available}")]
 
+    # ── graph queries ────────────────────────────────────────────────────────
+    elif name == "get_term_neighbourhood":
+        term = arguments.get("term", "").strip()
+        key = graph_node(term)
+        if key is None:
+            return [types.TextContent(type="text", text=f"Term '{term}' not found in the graph.")]
+        hops = min(max(1, int(arguments.get("hops", 2))), 10)
+        direction = arguments.get("direction", "out")
+        if direction not in ("out", "in", "both"):
+            direction = "out"
+        rings = GRAPH.neighbourhood(key, hops, direction)
+        if not rings:
+            return [types.TextContent(type="text",
+                text=f"No {direction}-neighbours of {graph_label(key)}.")]
+        lines = [f"**{sum(map(len, rings))} terms within {len(rings)} hop(s) of "
+                 f"{graph_label(key)}** (direction: {direction})\n"]
+        for d, ring in enumerate(rings, 1):
+            lines.append(f"### {d} hop{'s' if d > 1 else ''} ({len(ring)})")
+            lines.append(", ".join(graph_label(k) for k in ring))
+            lines.append("")
+        return [types.TextContent(type="text", text="\n".join(lines))]
+
+    elif name == "get_concept_path":
+        ends = [arguments.get(k, "").strip() for k in ("source", "target")]
+        keys = [graph_node(t) for t in ends]
+        for t, k in zip(ends, keys):
+            if k is None:
+                return [types.TextContent(type="text", text=f"Term '{t}' not found in the graph.")]
+        chain, how = GRAPH.path(*keys), "each definition uses the next"
+        if chain is None:
+            chain, how = GRAPH.path(*keys, direction="both"), "ignoring direction"
+        if chain is None:
+            return [types.TextContent(type="text",
+                text=f"No path between {graph_label(keys[0])} and {graph_label(keys[1])}.")]
+        text = (f"**Path of length {len(chain) - 1}** ({how}):\n\n"
+                + " → ".join(graph_label(k) for k in chain))
+        return [types.TextContent(type="text", text=text)]
+
+    elif name == "get_prerequisites":
+        term = arguments.get("term", "").strip()
+        key = graph_node(term)
+        if key is None:
+            return [types.TextContent(type="text", text=f"Term '{term}' not found in the graph.")]
+        limit = max(1, int(arguments.get("limit", 100)))
+        groups = GRAPH.prerequisites(key)
+        total = sum(map(len, groups))
+        if not total:
+            return [types.TextContent(type="text",
+                text=f"The definition of {graph_label(key)} uses no other terms.")]
+        lines = [f"**{total} prerequisites of {graph_label(key)}**, "
+                 f"foundations first" + (f" (first {limit})" if total > limit else "") + ":\n"]
+        shown = 0
+        for group in groups:
+            if shown >= limit:
+                break
+            if len(group) == 1:
+                lines.append(f"{shown + 1}. {graph_label(group[0])}")
+            else:
+                head = group[:limit - shown]
+                more = f", … {len(group) - len(head)} more" if len(head) < len(group) else ""
+                lines.append(f"{shown + 1}. mutually dependent ({len(group)}): "
+                             + ", ".join(graph_label(k) for k in head) + more)
+            shown += len(group)
+        return [types.TextContent(type="text", text="\n".join(lines))]
+
+    # ── lookup_terms / search_terms_batch ───────────────────────────────────
+    elif name == "lookup_terms":
+        terms = batch_arg(arguments, "terms")
+        if isinstance(terms, str):
+            return [types.TextContent(type="text", text=terms)]
+        return [types.TextContent(type="text", text=json.dumps(
+            lookup_batch(terms), ensure_ascii=False))]
+
+    elif name == "search_terms_batch":
+        queries = batch_arg(arguments, "queries")
+        if isinstance(queries, str):
+            return [types.TextContent(type="text", text=queries)]
+        top_k = max(1, int(arguments.get("top_k", 5)))
+        snippets = bool(arguments.get("snippets", True))
+        return [types.TextContent(type="text", text=json.dumps(
+            search_batch(queries, top_k, snippets), ensure_ascii=False))]
+
+    # ── server_status ────────────────────────────────────────────────────────
+    elif name == "server_status":
+        by_cat: dict[str, int] = {}
+        for e in ENTRIES.values():
+            by_cat[e["category"]] = by_cat.get(e["category"], 0) + 1
+        last = RELOAD_STATS["last_reload"]
+        lines = [
+            f"**Repository:** `{REPO_DIR}`",
+            f"**Loaded:** glossary {load_state('glossary')}, "
+            f"style guides {load_state('style')}",
+            f"**Terms:** {len(ENTRIES)} "
+            + "(" + ", ".join(f"{c} {by_cat.get(c, 0)}" for c in GLOSSARY_FILES) + ")",
+            f"**Search index:** {len(SEARCH.postings)} terms, {len(LOOKUP)} spellings",
+            f"**Graph:** {len(GRAPH.keys)} terms, {GRAPH.n_edges} references "
+            f"(from {GRAPH.source})",
+            f"**Watching:** every {POLL_SECONDS:g} s" if POLL_SECONDS > 0 else "**Watching:** off",
+            f"**Reloads:** {RELOAD_STATS['reloads']}",
+            f"**Response cache:** {RESPONSES.summary()}" if RESPONSES.max_bytes > 0
+            else "**Response cache:** off",
+            f"**Transport:** {transport_summary()}",
+        ]
+        if last is not None:
+            lines.append(
+                f"**Last reload:** {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last))} "
+                f"({', '.join(RELOAD_STATS['last_files'])}, {RELOAD_STATS['last_ms']:.0f} ms)")
+        if RELOAD_STATS["last_error"]:
+            lines.append(f"**Last reload error:** {RELOAD_STATS['last_error']}")
+        return [types.TextContent(type="text", text="\n".join(lines))]
+
     return [types.TextContent(type="text", text=f"Unknown tool: {name}")]
 
 
+_T_READY = time.perf_counter()
+
+
+# ── HTTP/SSE transport ────────────────────────────────────────────────────────
+# stdio has one client and no limits; serve_sse() sets the call limit
+TRANSPORT = {"mode": "stdio", "clients": 0, "peak": 0, "sessions": 0,
+             "rejected": 0, "calls": 0, "waiting": 0}
+CALL_SLOTS: asyncio.Semaphore | None = None
+
+
+def transport_summary() -> str:
+    t = TRANSPORT
+    if t["mode"] == "stdio":
+        return "stdio"
+    return (f"{t['mode']}, {t['clients']} clients (peak {t['peak']}, "
+            f"{t['sessions']} sessions, {t['rejected']} turned away); "
+            f"{t['calls']} calls, {t['waiting']} waiting for a slot")
+
+
+async def serve_sse(host: str, port: int, max_clients: int, max_calls: int) -> None:
+    """
+    Serve MCP over HTTP/SSE: each GET /sse opens a session on the shared
+    server, whose messages arrive as POST /messages/?session_id=...
+    starlette and uvicorn are only needed here, so they are imported here.
+    """
+    global CALL_SLOTS
+    try:
+        import uvicorn
+        from mcp.server.sse import SseServerTransport
+        from starlette.applications import Starlette
+        from starlette.responses import PlainTextResponse, Response
+        from starlette.routing import Mount, Route
+    except ImportError as e:
+        log(f"[ERROR] --sse needs starlette and uvicorn ({e}); "
+            f"pip install -r requirements.txt")
+        sys.exit(1)
+
+    CALL_SLOTS = asyncio.Semaphore(max(1, max_calls))
+    TRANSPORT["mode"] = f"HTTP/SSE on {host}:{port}"
+    sse = SseServerTransport("/messages/")
+
+    async def handle_sse(request):
+        if TRANSPORT["clients"] >= max_clients:
+            TRANSPORT["rejected"] += 1
+            return PlainTextResponse(f"Busy: {max_clients} clients connected.\n",
+                                     status_code=503)
+        TRANSPORT["clients"] += 1
+        TRANSPORT["sessions"] += 1
+        TRANSPORT["peak"] = max(TRANSPORT["peak"], TRANSPORT["clients"])
+        try:
+            async with sse.connect_sse(request.scope, request.receive,
+                                       request._send) as (read, write):
+                await server.run(read, write, server.create_initialization_options())
+        finally:
+            TRANSPORT["clients"] -= 1
+        return Response()
+
+    app = Starlette(routes=[
+        Route("/sse", endpoint=handle_sse, methods=["GET"]),
+        Mount("/messages/", app=sse.handle_post_message),
+    ])
+    log(f"[INFO] Serving MCP over HTTP/SSE at http://{host}:{port}/sse "
+        f"(at most {max_clients} clients, {max_calls} calls at once)")
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning")
+    await uvicorn.Server(config).serve()
+
+
 # ── Entrypoint ────────────────────────────────────────────────────────────────
-async def main():
+def profile_startup() -> None:
+    """Load everything in the foreground and report the time of each step."""
+    t0 = time.perf_counter()
+    categories, entries, search, lookup, graph = load_glossary_data()
+    t1 = time.perf_counter()
+    style_guide = load_style_data()
+    t2 = time.perf_counter()
+    rows = [
+        ("imports", _T_IMPORTS - _T_START),
+        ("  of which mcp", _T_MCP),
+        ("module body", _T_READY - _T_IMPORTS),
+        ("ready for the handshake", _T_READY - _T_START),
+        ("glossary parse", LOAD_MS["parse"] / 1e3),
+        ("search, lookup, graph", LOAD_MS["index"] / 1e3),
+        ("style guides", t2 - t1),
+        ("all data loaded", t2 - t0 + _T_READY - _T_START),
+    ]
+    log(f"[PROFILE] {len(entries)} terms, {len(search.postings)} index terms, "
+        f"{len(lookup)} spellings, {len(style_guide)} style topics")
+    for label, secs in rows:
+        log(f"[PROFILE] {label:26s} {secs * 1e3:8.1f} ms")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    ap = argparse.ArgumentParser(description="MCP server for the Aalto Dictionary of ML.")
+    ap.add_argument("--profile-startup", action="store_true",
+                    help="Load everything in the foreground, report timings and exit.")
+    ap.add_argument("--sse", action="store_true",
+                    help="Serve over HTTP/SSE instead of stdio.")
+    ap.add_argument("--host", default=HTTP_HOST, help=f"HTTP address (default {HTTP_HOST}).")
+    ap.add_argument("--port", type=int, default=HTTP_PORT, help=f"HTTP port (default {HTTP_PORT}).")
+    ap.add_argument("--max-clients", type=int, default=MAX_CLIENTS,
+                    help=f"Clients connected at once (default {MAX_CLIENTS}).")
+    ap.add_argument("--max-calls", type=int, default=MAX_CALLS,
+                    help=f"Tool calls worked on at once (default {MAX_CALLS}).")
+    return ap.parse_args(argv)
+
+
+async def main(args: argparse.Namespace):
+    start_loading()
+    if POLL_SECONDS > 0:
+        asyncio.get_running_loop().create_task(watch_glossary())
+    if args.sse:
+        await serve_sse(args.host, args.port, args.max_clients, args.max_calls)
+        return
     async with mcp.server.stdio.stdio_server() as (read, write):
         await server.run(read, write, server.create_initialization_options())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    args = parse_args()
+    if args.profile_startup:
+        profile_startup()
+    else:
+        asyncio.run(main(args))
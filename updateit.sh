@@ -10,7 +10,7 @@ set -euo pipefail
 #   BACKUP_LAYOUT=mirror  # or: timestamp
 #
 # What it does:
-#  1) runs your Python scripts
+#  1) runs your Python scripts (skipping those whose inputs did not change)
 #  2) cleans LaTeX junk
 #  3) commits & pushes main repo
 #  4) backs up ALL TeX files starting with ADictML* (plus a few key assets)
@@ -48,11 +48,10 @@ fi
 # echo "[INFO] Running FlattenGlossary.py ..."
 # python assets/FlattenGlossary.py
 
-echo "[INFO] Running DependencyGraph.py ..."
-python assets/DependencyGraph.py
-
-echo "[INFO] Running countterms.py ..."
-python assets/countterms.py
+# DependencyGraph.py and countterms.py, in parallel, each only when its inputs
+# changed since its last run (see assets/pipeline.py; --force reruns both)
+echo "[INFO] Running generation pipeline ..."
+python assets/pipeline.py
 
 # --- Clean LaTeX junk (flexible + safe) ---
 echo "[INFO] Cleaning LaTeX temporary files ..."